@@ -0,0 +1,143 @@
+"""End-to-end benchmark: full polling cycles against a local EDGAR/Discord stub
+
+Usage: python benchmarks/bench_cycle.py [--latency SECONDS] [--discord-429-every N]
+                                        [--sec-rate PER_SECOND] [--json OUT]
+
+Runs main() in a scratch directory with every sec.gov and Discord URL pointed
+at benchmarks/edgar_stub.py, so nothing leaves the machine. Scenarios:
+
+  quiet   state already primed, the feed answers 304 to the conditional GET
+  burst   200 new filings land between two polls, no filters
+  giant   a handful of filings with ~2000 derivative rows each
+
+For each scenario prints main()'s wall time, SEC requests the stub served,
+webhook posts (including 429s), alerts received, alerts per second and
+what is left in the backlog for the next cycle (BACKLOG_BATCH_SIZE caps a cycle).
+--sec-rate defaults to effectively unlimited so the numbers measure the bot,
+not SEC's 10 req/s budget; pass --sec-rate 10 to see the production pacing.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sec_form4_bot as bot
+from edgar_stub import EdgarStub
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+BURST_FILINGS = 200
+GIANT_FILINGS = 5
+GIANT_DERIVATIVE_ROWS = 2000
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
+
+
+def giant_document(rows=GIANT_DERIVATIVE_ROWS):
+    """The option-grant fixture with its derivative rows replicated up to rows"""
+    document = load_fixture('form4_option_grants.xml')
+    table = re.search(rb'<derivativeTable>(.*?)</derivativeTable>', document, re.S)
+    row = re.search(rb'<derivativeTransaction>.*?</derivativeTransaction>', table.group(1), re.S).group(0)
+    return document[:table.start(1)] + row * rows + document[table.end(1):]
+
+
+def reset_bot(sec_rate):
+    """Fresh module globals, so one scenario's caches don't flatter the next"""
+    bot.HTTP = bot.HttpTransport()
+    bot.FILING_CACHE = bot.FilingCache()
+    bot.CLUSTER_DETECTOR = bot.ClusterDetector()
+    bot.METRICS = bot.Metrics()
+    bot.SEC_RATE_LIMITER = bot.RateLimiter(sec_rate)
+    bot.XML_URL_CACHE.clear()
+    bot.COMPANY_TICKERS.clear()
+
+
+def run_main():
+    """One-shot main() with its console output swallowed; returns wall seconds"""
+    sys.argv = ['sec_form4_bot.py']
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        bot.main()
+    return time.perf_counter() - started
+
+
+def run_scenario(name, stub, sec_rate, prime, publish):
+    """Prime state with one main(), publish the scenario's filings, time a second main()"""
+    workdir = tempfile.mkdtemp(prefix=f"form4-bench-{name}-")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        reset_bot(sec_rate)
+        prime()
+        run_main()
+
+        publish()
+        stub.reset_counters()
+        bot.METRICS = bot.Metrics()
+        seconds = run_main()
+        stages = bot.METRICS.summary()['stages']
+        store = bot.FilingStore()
+        backlog = store.backlog_size()
+        store.close()
+    finally:
+        os.chdir(cwd)
+
+    alerts = stub.alerts_received()
+    return {
+        'scenario': name,
+        'wall_seconds': round(seconds, 4),
+        'sec_requests': stub.sec_requests,
+        'webhook_posts': stub.webhook_posts,
+        'alerts': alerts,
+        'alerts_per_second': round(alerts / seconds, 1) if seconds else 0.0,
+        'backlog_left': backlog,
+        'stages': {stage: stats['total_seconds'] for stage, stats in stages.items()}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every stub response')
+    parser.add_argument('--discord-429-every', type=int, default=0, help='answer every Nth webhook post with a 429')
+    parser.add_argument('--sec-rate', type=float, default=1000.0, help='SEC requests per second allowed')
+    parser.add_argument('--json', metavar='OUT', help='also write the results to this JSON file')
+    args = parser.parse_args()
+
+    purchase = load_fixture('form4_purchase.xml')
+    giant = giant_document()
+    scenarios = [
+        ('quiet', lambda stub: stub.publish(20, purchase), lambda stub: None),
+        ('burst', lambda stub: stub.publish(1, purchase), lambda stub: stub.publish(BURST_FILINGS, purchase)),
+        ('giant', lambda stub: stub.publish(1, purchase), lambda stub: stub.publish(GIANT_FILINGS, giant))
+    ]
+
+    results = []
+    for name, prime, publish in scenarios:
+        stub = EdgarStub(latency=args.latency, webhook_429_every=args.discord_429_every)
+        stub.point(bot)
+        try:
+            result = run_scenario(name, stub, args.sec_rate, lambda: prime(stub), lambda: publish(stub))
+        finally:
+            stub.stop()
+        results.append(result)
+        print(f"{name:6s} {result['wall_seconds']:8.3f}s  {result['sec_requests']:4d} SEC requests  "
+              f"{result['webhook_posts']:3d} webhook posts  {result['alerts']:4d} alerts  "
+              f"{result['alerts_per_second']:8.1f} alerts/s  {result['backlog_left']:4d} left in backlog")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'latency': args.latency, 'discord_429_every': args.discord_429_every,
+                       'sec_rate': args.sec_rate, 'results': results}, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
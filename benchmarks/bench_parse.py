@@ -0,0 +1,137 @@
+"""Microbenchmark: streaming lxml Form 4 parser vs. the old BeautifulSoup parser
+
+Usage: python benchmarks/bench_parse.py [iterations]
+
+Runs both parsers over every recorded fixture in benchmarks/fixtures, checks
+they agree on issuer, owner and every transaction's code, date, shares and
+value, and prints per-document timings.
+"""
+import os
+import sys
+import timeit
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sec_form4_bot as bot
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def get_text(element, default=''):
+    if element is None:
+        return default
+    text = element.get_text(strip=True)
+    return text if text else default
+
+
+def legacy_parse_transaction(trans_elem, is_derivative=False):
+    """The BeautifulSoup transaction parser this benchmark measures against"""
+    trans = {'is_derivative': is_derivative}
+    if is_derivative:
+        security = trans_elem.find('derivativeSecurityTitle')
+    else:
+        security = trans_elem.find('securityTitle')
+    trans['security'] = get_text(security.find('value'), 'Common Stock') if security else 'Common Stock'
+    
+    trans_date = trans_elem.find('transactionDate')
+    if trans_date:
+        trans['date'] = get_text(trans_date.find('value'))
+    
+    trans_coding = trans_elem.find('transactionCoding')
+    if trans_coding:
+        code = get_text(trans_coding.find('transactionCode'))
+        trans['type'] = bot.TRANSACTION_TYPES.get(code, code)
+        trans['code'] = code
+    
+    amounts = trans_elem.find('transactionAmounts')
+    if amounts:
+        shares_elem = amounts.find('transactionShares')
+        trans['shares'] = get_text(shares_elem.find('value'), '0') if shares_elem else '0'
+        price_elem = amounts.find('transactionPricePerShare')
+        trans['price'] = get_text(price_elem.find('value'), '0') if price_elem else '0'
+    
+    try:
+        shares_num = float(trans.get('shares', '0').replace(',', ''))
+        price_num = float(trans.get('price', '0').replace(',', ''))
+        trans['amount'] = shares_num * price_num
+    except ValueError:
+        trans['amount'] = 0
+    return trans
+
+
+def legacy_parse_form4(content):
+    """The BeautifulSoup document parser this benchmark measures against"""
+    soup = BeautifulSoup(content, 'xml')
+    details = {}
+    
+    issuer = soup.find('issuer')
+    if issuer:
+        details['issuer_name'] = get_text(issuer.find('issuerName'), 'N/A')
+        details['ticker'] = get_text(issuer.find('issuerTradingSymbol'), 'N/A')
+        details['cik'] = get_text(issuer.find('issuerCik'), 'N/A')
+    
+    owner = soup.find('reportingOwner')
+    if owner:
+        owner_id = owner.find('reportingOwnerId')
+        if owner_id:
+            details['owner_name'] = get_text(owner_id.find('rptOwnerName'), 'N/A')
+        relationship = owner.find('reportingOwnerRelationship')
+        if relationship:
+            titles = []
+            if get_text(relationship.find('isDirector')) == '1':
+                titles.append('Director')
+            if get_text(relationship.find('isOfficer')) == '1':
+                title = get_text(relationship.find('officerTitle'))
+                if title:
+                    titles.append(title)
+            if get_text(relationship.find('isTenPercentOwner')) == '1':
+                titles.append('10% Owner')
+            details['owner_title'] = ', '.join(titles) if titles else 'Beneficial Owner'
+    
+    transactions = []
+    for trans_elem in soup.find_all('nonDerivativeTransaction'):
+        transactions.append(legacy_parse_transaction(trans_elem, is_derivative=False))
+    for trans_elem in soup.find_all('derivativeTransaction'):
+        transactions.append(legacy_parse_transaction(trans_elem, is_derivative=True))
+    details['transactions'] = transactions
+    return details
+
+
+def legacy_projection(details):
+    """What both parsers must agree on, from the legacy details dict"""
+    rows = [(t['code'], t['date'], float(t['shares']) if t['shares'] else None, t['amount'])
+            for t in details['transactions']]
+    return details.get('ticker'), details.get('owner_name'), rows
+
+
+def typed_projection(filing):
+    """The same projection from a Form4Filing"""
+    rows = [(t.code, t.date, t.shares, t.amount) for t in filing.transactions]
+    return filing.ticker, filing.owner.name if filing.owner else None, rows
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    
+    print(f"{'fixture':<32}{'rows':>6}{'bs4 ms':>12}{'lxml ms':>12}{'speedup':>10}")
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if not name.endswith('.xml'):
+            continue
+        with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+            content = f.read()
+        
+        expected = legacy_parse_form4(content)
+        actual = bot.parse_form4_document(content)
+        if typed_projection(actual) != legacy_projection(expected):
+            print(f"✗ {name}: parsers disagree")
+            sys.exit(1)
+        
+        legacy = min(timeit.repeat(lambda: legacy_parse_form4(content), number=iterations, repeat=3)) / iterations
+        streaming = min(timeit.repeat(lambda: bot.parse_form4_document(content), number=iterations, repeat=3)) / iterations
+        rows = len(actual.transactions)
+        print(f"{name:<32}{rows:>6}{legacy * 1000:>12.3f}{streaming * 1000:>12.3f}{legacy / streaming:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Local stand-in for the parts of EDGAR and Discord the bot talks to
+
+Serves a getcurrent-style atom feed, filing index.json and -index.htm pages,
+Form 4 XML documents and company_tickers.json from memory, and records
+every payload posted to its fake webhook. Every response can be delayed,
+and the webhook can answer with 429s, so benchmarks can reproduce slow or
+rate-limited endpoints without touching sec.gov or Discord.
+
+    stub = EdgarStub(latency=0.02, webhook_429_every=5)
+    stub.publish(200, fixture_bytes)
+    stub.point(bot)  # Aim sec_form4_bot's URLs at the stub
+    ...
+    stub.stop()
+"""
+import json
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+ISSUER_PATTERN = re.compile(rb'<issuerCik>\s*(\d+)\s*</issuerCik>.*?<issuerName>\s*(.*?)\s*</issuerName>'
+                            rb'.*?<issuerTradingSymbol>\s*(.*?)\s*</issuerTradingSymbol>', re.S)
+OWNER_PATTERN = re.compile(rb'<rptOwnerCik>\s*(\d+)\s*</rptOwnerCik>\s*<rptOwnerName>\s*(.*?)\s*</rptOwnerName>', re.S)
+
+
+class EdgarStub:
+    """Threaded HTTP server holding the filings a benchmark has published"""
+
+    def __init__(self, latency=0.0, webhook_429_every=0, retry_after=0.05):
+        self.latency = latency
+        self.webhook_429_every = webhook_429_every
+        self.retry_after = retry_after
+        self.filings = []   # Oldest first
+        self.documents = {}  # accession -> Form 4 XML bytes
+        self.tickers = {}
+        self.payloads = []
+        self.sec_requests = 0
+        self.webhook_posts = 0
+        self.lock = threading.Lock()
+        self.clock = datetime.now(timezone.utc) - timedelta(hours=1)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler())
+        self.server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        self.thread = threading.Thread(target=self.server.serve_forever, name='edgar-stub', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def point(self, bot):
+        """Aim every sec.gov and Discord URL of the bot module at this stub"""
+        bot.SEC_DAILY_INDEX_BASE = f"{self.base_url}/cgi-bin/browse-edgar"
+        bot.COMPANY_TICKERS_URL = f"{self.base_url}/files/company_tickers.json"
+        bot.SEC_ARCHIVES_BASE = f"{self.base_url}/Archives/edgar/data"
+        bot.SEC_SUBMISSIONS_BASE = f"{self.base_url}/submissions"
+        bot.DISCORD_WEBHOOK = f"{self.base_url}/webhook"
+
+    def publish(self, count, document):
+        """Add count new filings of one Form 4 document to the feed"""
+        issuer_cik, issuer_name, ticker = ISSUER_PATTERN.search(document).groups()
+        owner_cik, owner_name = OWNER_PATTERN.search(document).groups()
+        issuer_cik = int(issuer_cik)
+
+        with self.lock:
+            self.tickers[ticker.decode().upper()] = issuer_cik
+            for _ in range(count):
+                self.clock += timedelta(seconds=1)
+                accession = f"0009999999-25-{len(self.filings) + 1:06d}"
+                self.documents[accession] = document
+                self.filings.append({
+                    'accession': accession,
+                    'issuer_cik': issuer_cik,
+                    'issuer_name': issuer_name.decode(),
+                    'owner_cik': int(owner_cik),
+                    'owner_name': owner_name.decode(),
+                    'updated': self.clock.isoformat()
+                })
+
+    def reset_counters(self):
+        with self.lock:
+            self.payloads = []
+            self.sec_requests = 0
+            self.webhook_posts = 0
+
+    def alerts_received(self):
+        with self.lock:
+            return sum(len(payload.get('embeds', payload.get('alerts', []))) for payload in self.payloads)
+
+    def filing_url(self, filing, cik=None):
+        folder = filing['accession'].replace('-', '')
+        return f"{self.base_url}/Archives/edgar/data/{cik or filing['issuer_cik']}/{folder}/{filing['accession']}-index.htm"
+
+    def feed(self, start, count):
+        """One page of the atom feed: an Issuer and a Reporting entry per filing, newest first"""
+        entries = []
+        with self.lock:
+            filings = list(reversed(self.filings))
+        for filing in filings:
+            for role, cik, name in (('Reporting', filing['owner_cik'], filing['owner_name']),
+                                    ('Issuer', filing['issuer_cik'], filing['issuer_name'])):
+                entries.append(
+                    f'<entry><title>4 - {name} ({cik:010d}) ({role})</title>'
+                    f'<link rel="alternate" type="text/html" href="{self.filing_url(filing, cik)}"/>'
+                    f'<summary type="html"> &lt;b&gt;Filed:&lt;/b&gt; {filing["updated"][:10]} '
+                    f'&lt;b&gt;AccNo:&lt;/b&gt; {filing["accession"]} &lt;b&gt;Size:&lt;/b&gt; 6 KB</summary>'
+                    f'<updated>{filing["updated"]}</updated>'
+                    f'<category scheme="https://www.sec.gov/" label="form type" term="4"/>'
+                    f'<id>urn:tag:sec.gov,2008:accession-number={filing["accession"]}</id></entry>')
+        return ('<?xml version="1.0" encoding="ISO-8859-1" ?>'
+                '<feed xmlns="http://www.w3.org/2005/Atom"><title>Latest Filings - Form 4</title>'
+                + ''.join(entries[start:start + count]) + '</feed>').encode()
+
+    def index_page(self, path):
+        """A filing's -index.htm page, with the document table the scraper reads"""
+        folder = path.rsplit('/', 1)[0]
+        return (f'<html><body><table class="tableFile" summary="Document Format Files">'
+                f'<tr><th>Seq</th><th>Description</th><th>Document</th><th>Type</th></tr>'
+                f'<tr><td>1</td><td>FORM 4</td><td><a href="{folder}/xslF345X05/form4.xml">form4.html</a></td><td>4</td></tr>'
+                f'<tr><td>1</td><td>FORM 4</td><td><a href="{folder}/form4.xml">form4.xml</a></td><td>4</td></tr>'
+                f'</table></body></html>').encode()
+
+    def handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def reply(self, status, body=b'', content_type='text/plain', headers=()):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                with stub.lock:
+                    stub.sec_requests += 1
+                    etag = f'"{len(stub.filings)}"'
+                url = urlparse(self.path)
+
+                if url.path == '/cgi-bin/browse-edgar':
+                    if self.headers.get('If-None-Match') == etag:
+                        return self.reply(304)
+                    query = parse_qs(url.query)
+                    body = stub.feed(int(query.get('start', ['0'])[0]), int(query.get('count', ['100'])[0]))
+                    return self.reply(200, body, 'application/atom+xml', [('ETag', etag)])
+                if url.path == '/files/company_tickers.json':
+                    rows = {str(i): {'cik_str': cik, 'ticker': ticker, 'title': ticker}
+                            for i, (ticker, cik) in enumerate(sorted(stub.tickers.items()))}
+                    return self.reply(200, json.dumps(rows).encode(), 'application/json')
+
+                accession = url.path.rsplit('/', 2)[-2] if url.path.count('/') > 2 else ''
+                accession = f"{accession[:10]}-{accession[10:12]}-{accession[12:]}"
+                if url.path.endswith('/index.json'):
+                    listing = {'directory': {'item': [{'name': f"{accession}-index.htm"}, {'name': 'form4.xml'}]}}
+                    return self.reply(200, json.dumps(listing).encode(), 'application/json')
+                if url.path.endswith('-index.htm'):
+                    return self.reply(200, stub.index_page(url.path), 'text/html')
+                if url.path.endswith('/form4.xml') and accession in stub.documents:
+                    return self.reply(200, stub.documents[accession], 'application/xml')
+                self.reply(404)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if stub.latency:
+                    time.sleep(stub.latency)
+                with stub.lock:
+                    stub.webhook_posts += 1
+                    throttled = stub.webhook_429_every and stub.webhook_posts % stub.webhook_429_every == 0
+                    if not throttled:
+                        stub.payloads.append(json.loads(body))
+                if throttled:
+                    body = json.dumps({'message': 'You are being rate limited.', 'retry_after': stub.retry_after})
+                    return self.reply(429, body.encode(), 'application/json',
+                                      [('Retry-After', str(stub.retry_after))])
+                self.reply(204, headers=[('X-RateLimit-Remaining', '4'), ('X-RateLimit-Reset-After', '0.1')])
+
+        return Handler
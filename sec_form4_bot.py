@@ -1,29 +1,2065 @@
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
+from lxml import etree
+from io import BytesIO
+from urllib.parse import parse_qs, urljoin, urlparse
 import json
-from datetime import datetime, timedelta
+import csv
+import bisect
+import cProfile
+import pstats
+import hashlib
+import gzip
+import multiprocessing
+import sqlite3
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
 import os
+import re
 import time
+import random
 import sys
+import signal
+import subprocess
+import threading
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dataclasses import dataclass, field, asdict
+from zoneinfo import ZoneInfo
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Optional; only needed for Parquet/Arrow exports
+    pa = None
 
 DISCORD_WEBHOOK = "https://discord.com/api/webhooks/1427024017126195281/XsX8beOMl7mQajGBCkCFEPPrbtWaAENxb2pCwe83GHwAZpDEw5x29nXZDu_BB1PmOv3p"
-STATE_FILE = "last_filings.json"
+STATE_DB = "form4_state.db"
+STATE_RETENTION_DAYS = 30  # Finished filings are forgotten after this long
+SEEN_RETENTION_DAYS = 3    # ...or this long for ones never alerted on; they only cover the feed overlap
 FILTERS_FILE = "ticker_filters.json"
+ALERT_RULES_FILE = "alert_rules.json"  # Takes over from FILTERS_FILE when present
+ALERT_ROUTES_FILE = "alert_routes.json"  # Destinations and routes; DISCORD_WEBHOOK only when absent
+COMPANY_TICKERS_FILE = "company_tickers.json"
+COMPANY_TICKERS_MAX_AGE_DAYS = 7
+FILING_CACHE_DIR = "filing_cache"
+FILING_CACHE_MAX_BYTES = 512 * 1024 * 1024
+PARSER_VERSION = 2  # Bump when parse_form4_document output changes
+HISTORY_DB = "form4_history.db"
+EXPORT_DIR = "exports"
+
+# JSON state files from before the SQLite store, imported on first run
+LEGACY_STATE_FILE = "last_filings.json"
+LEGACY_XML_URL_CACHE_FILE = "xml_url_cache.json"
+LEGACY_HTTP_VALIDATORS_FILE = "http_validators.json"
 
 # Official SEC EDGAR RSS feed
 SEC_DAILY_INDEX_BASE = "https://www.sec.gov/cgi-bin/browse-edgar"
+# SEC's ticker -> CIK map for every listed issuer
+COMPANY_TICKERS_URL = "https://www.sec.gov/files/company_tickers.json"
+# Per-issuer filing history, used by the submissions source
+SEC_SUBMISSIONS_BASE = "https://data.sec.gov/submissions"
+SEC_ARCHIVES_BASE = "https://www.sec.gov/Archives/edgar/data"
+# Quarterly and daily EDGAR indexes, used by backfills
+SEC_FULL_INDEX_BASE = "https://www.sec.gov/Archives/edgar/full-index"
+SEC_DAILY_INDEX_ARCHIVE = "https://www.sec.gov/Archives/edgar/daily-index"
+
+# Where new filings come from: the global 'feed', or per-issuer 'submissions'
+# polling, which suits watchlists of hundreds of tickers
+FORM4_SOURCE = os.environ.get('FORM4_SOURCE', 'feed').lower()
+SUBMISSIONS_FORMS = ('4', '4/A')
+SUBMISSIONS_POLLS_PER_CYCLE = 60  # About 6s of the SEC budget per cycle
+SUBMISSIONS_MIN_INTERVAL = 60     # Seconds between polls of a busy issuer
+SUBMISSIONS_MAX_INTERVAL = 900    # ...and of one with no recent Form 4s
+
+# SEC fair access policy allows 10 requests/second across all of our traffic
+SEC_MAX_REQUESTS_PER_SECOND = 10
+FETCH_WORKERS = 8
+FEED_PAGE_SIZE = 100
+MAX_FEED_PAGES = 20       # Safety stop when paging back to the watermark
+BACKLOG_BATCH_SIZE = 100  # Filings drained from the backlog per cycle
+
+# Discord webhook delivery
+DISCORD_MAX_EMBEDS = 10          # Per webhook message
+DISCORD_MAX_EMBED_CHARS = 6000   # Combined embed text per message
+DISCORD_BATCH_LINGER = 0.25      # Seconds to let a burst fill a message
+DISCORD_MAX_ATTEMPTS = 5
+DISCORD_RETRY_BASE = 1.0         # Seconds, doubled after each failed attempt
+JSON_WEBHOOK_MAX_BATCH = 50      # Alerts per generic JSON webhook post
+
+# Filings whose fetch hit a transient error, or whose alert couldn't be
+# delivered, are retried in later cycles with jittered exponential backoff
+# and dead-lettered after RETRY_MAX_ATTEMPTS
+RETRY_MAX_ATTEMPTS = 8
+RETRY_BASE_DELAY = 60        # Seconds before the first retry, doubled after each
+RETRY_MAX_DELAY = 6 * 3600
+
+# Sharded mode: a coordinator polls and queues filings, and worker processes
+# lease batches of them from the shared store, split by issuer CIK
+SHARD_LEASE_SECONDS = 600  # A worker's hold on leased filings; renewed while it works
+SHARD_IDLE_WAIT = 5        # Seconds a worker sleeps when its shard has nothing due
+SHARD_STOP_TIMEOUT = 60    # Seconds the coordinator gives workers to flush on shutdown
+
+# Transaction export: 'parquet', 'arrow' or 'csv'; unset disables it
+EXPORT_FORMAT = os.environ.get('FORM4_EXPORT', '').lower()
+EXPORT_ROW_GROUP_SIZE = 50000  # Rows buffered before a part file is written
+EXPORT_MAX_LINGER = 900        # Seconds the daemon holds rows before writing anyway
+
+# Instrumentation: Prometheus endpoint for the daemon (0 turns it off), a JSON
+# summary after each one-shot run, and an optional cProfile dump of parsing
+METRICS_PORT = int(os.environ.get('FORM4_METRICS_PORT', '9464'))
+METRICS_SUMMARY_FILE = "run_metrics.json"
+PROFILE_PARSE_FILE = os.environ.get('FORM4_PROFILE_PARSE')  # Where to write parse profile stats
+METRICS_BUCKETS = {
+    'stage': (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    'latency': (5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+}
+
+# Local transaction queries over HISTORY_DB: the query command and the
+# serve-queries HTTP endpoint. The endpoint has no authentication, so it
+# only listens on loopback unless FORM4_QUERY_HOST says otherwise.
+QUERY_HOST = os.environ.get('FORM4_QUERY_HOST', '127.0.0.1')
+QUERY_PORT = int(os.environ.get('FORM4_QUERY_PORT', '8464'))
+QUERY_PAGE_SIZE = 50       # Filings per page when no limit is given
+QUERY_MAX_PAGE_SIZE = 1000
+QUERY_OPTIONS = ('ticker', 'cik', 'owner', 'owner_cik', 'code', 'role', 'min_value',
+                 'since', 'until', 'days', 'limit', 'cursor')
+
+# Cluster alerts: several insiders buying one ticker on the open market
+# within a few days. Open-market purchases/sales only, so routine grants
+# and tax withholding don't count.
+CLUSTER_WINDOW_DAYS = 7
+CLUSTER_MIN_BUYERS = 3            # Distinct insiders buying in the window
+CLUSTER_MIN_NET_FLOW = 250000     # Dollars bought minus dollars sold
+CLUSTER_MIN_BUY_SELL_RATIO = 2.0  # Dollars bought per dollar sold
+CLUSTER_BUY_CODES = ('P',)
+CLUSTER_SELL_CODES = ('S',)
+
+# Backfill: enough fetch threads to keep the rate limiter saturated, and a
+# process per core for parsing
+BACKFILL_FETCH_WORKERS = 16
+BACKFILL_PARSE_WORKERS = os.cpu_count() or 2
+BACKFILL_CHUNK_SIZE = 500  # Filings fetched, parsed and committed together
+
+# Daemon polling schedule (seconds), keyed by US/Eastern session
+EASTERN = ZoneInfo('America/New_York')
+POLL_INTERVALS = {
+    'after_hours': 15,   # 4pm-8pm, when most Form 4s land
+    'market': 30,        # 9:30am-4pm
+    'pre_market': 60,    # 6am-9:30am
+    'overnight': 300,
+    'weekend': 600
+}
+IDLE_BACKOFF_FACTOR = 1.5  # Stretch the interval after each quiet poll...
+IDLE_BACKOFF_LIMIT = 4     # ...up to this multiple of the base interval
+
+SEC_USER_AGENT = 'Discord Bot sec-form4-tracker/1.0 (contact@example.com)'
+FEED_ACCEPT = 'application/atom+xml,application/xml,text/xml,*/*'
+INDEX_JSON_ACCEPT = 'application/json'
+INDEX_PAGE_ACCEPT = 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8'
+XML_ACCEPT = 'application/xml,text/xml,*/*'
+
+
+@dataclass(slots=True)
+class Transaction:
+    """One row of a Form 4 table, with numbers parsed once at parse time"""
+    security: str = 'Common Stock'
+    is_derivative: bool = False
+    date: str = ''
+    code: str = ''
+    type: str = ''
+    shares: float | None = None
+    price: float | None = None
+    price_note: str = ''  # Footnote attached to the price, e.g. a weighted average range
+    amount: float = 0.0
+    is_buy: bool = False
+    is_sell: bool = False
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+@dataclass(slots=True)
+class ReportingOwner:
+    name: str = 'N/A'
+    title: str = 'Beneficial Owner'
+    cik: str = ''
+    is_director: bool = False
+    is_officer: bool = False
+    is_ten_percent_owner: bool = False
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+@dataclass(slots=True)
+class Form4Filing:
+    """Everything the bot uses from one Form 4 document"""
+    issuer_name: str = 'N/A'
+    ticker: str = 'N/A'
+    cik: str = 'N/A'
+    owner: ReportingOwner | None = None
+    transactions: list = field(default_factory=list)
+    has_buy: bool = False
+    has_sell: bool = False
+    total_value: float = 0.0
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        if data.get('owner') is not None:
+            data['owner'] = ReportingOwner.from_dict(data['owner'])
+        data['transactions'] = [Transaction.from_dict(t) for t in data.get('transactions', [])]
+        return cls(**data)
+
+
+class RateLimiter:
+    """Thread-safe token bucket shared by every worker that talks to SEC"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request token is available"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SharedRateLimiter:
+    """Token bucket kept in SQLite, so every process on the machine shares one SEC budget
+    
+    Drop-in for RateLimiter. Each acquire() is one short IMMEDIATE
+    transaction on the rate_budget table, which SQLite serializes across
+    processes, and the bucket refills on wall-clock time for the same reason.
+    """
+
+    def __init__(self, path, rate, burst=1, name='sec'):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.name = name
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('CREATE TABLE IF NOT EXISTS rate_budget '
+                        '(name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)')
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request token is available"""
+        while True:
+            with self.lock:
+                self.db.execute('BEGIN IMMEDIATE')
+                try:
+                    now = time.time()
+                    row = self.db.execute('SELECT tokens, updated FROM rate_budget WHERE name = ?',
+                                          (self.name,)).fetchone()
+                    tokens = self.burst if row is None else min(self.burst, row[0] + max(now - row[1], 0) * self.rate)
+                    wait = 0 if tokens >= 1 else (1 - tokens) / self.rate
+                    if not wait:
+                        tokens -= 1
+                    self.db.execute('INSERT OR REPLACE INTO rate_budget (name, tokens, updated) VALUES (?, ?, ?)',
+                                    (self.name, tokens, now))
+                    self.db.execute('COMMIT')
+                except BaseException:
+                    self.db.execute('ROLLBACK')
+                    raise
+            if not wait:
+                return
+            time.sleep(wait)
+
+
+class Metrics:
+    """Thread-safe stage timings, alert latency histograms and gauges
+    
+    Stage timings cover feed, resolve, download, parse, render, deliver, the
+    whole cycle and time spent waiting on the SEC rate limiter; alert
+    latency runs from a filing's EDGAR acceptance time (the atom <updated>
+    stamp) to the destination accepting its alert.
+    Rendered as Prometheus text for the daemon's /metrics endpoint, or as a
+    JSON summary at the end of a one-shot run.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}  # (kind, label) -> {'buckets', 'count', 'sum', 'max'}
+        self.gauges = {}      # (name, labels) -> value
+        self.accepted = {}    # accession -> acceptance time, until its alert is settled
+        self.started = time.time()
+
+    @contextmanager
+    def timed(self, stage):
+        """Time a block of work as one observation of a pipeline stage"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe('stage', stage, time.perf_counter() - started)
+
+    def observe(self, kind, label, value):
+        bounds = METRICS_BUCKETS[kind]
+        with self.lock:
+            hist = self.histograms.get((kind, label))
+            if hist is None:
+                hist = self.histograms[(kind, label)] = {'buckets': [0] * len(bounds), 'count': 0,
+                                                         'sum': 0.0, 'max': 0.0}
+            index = bisect.bisect_left(bounds, value)
+            if index < len(bounds):
+                hist['buckets'][index] += 1
+            hist['count'] += 1
+            hist['sum'] += value
+            hist['max'] = max(hist['max'], value)
+
+    def alert_queued(self, key, filing_date):
+        """Remember when EDGAR accepted a filing whose alert was just queued"""
+        accepted = parse_feed_time(filing_date)
+        if key and accepted:
+            with self.lock:
+                self.accepted[key] = accepted.timestamp()
+
+    def alert_delivered(self, key, destination):
+        with self.lock:
+            accepted = self.accepted.get(key)
+        if accepted is not None:
+            self.observe('latency', destination, max(time.time() - accepted, 0.0))
+
+    def alert_settled(self, key):
+        with self.lock:
+            self.accepted.pop(key, None)
+
+    def set_gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def record_cycle(self, store, delivery, exporter=None):
+        """Snapshot queue depths and delivery counters after a cycle"""
+        self.set_gauge('form4_backlog_filings', store.backlog_size())
+        self.set_gauge('form4_retry_filings', store.retry_size())
+        self.set_gauge('form4_last_cycle_timestamp_seconds', time.time())
+        for name, sender in delivery.deliveries.items():
+            self.set_gauge('form4_delivery_queue_depth', sender.queue_depth(), destination=name)
+            self.set_gauge('form4_alerts_delivered_total', sender.embeds_sent, destination=name)
+            self.set_gauge('form4_delivery_messages_total', sender.messages_sent, destination=name)
+        if exporter:
+            self.set_gauge('form4_export_buffered_rows', exporter.buffered)
+    
+    def record_rules(self, rules):
+        """Export each alert rule's running hit and rejection counts"""
+        for rule in rules.rules:
+            self.set_gauge('form4_rule_hits_total', rule.hits, rule=rule.name)
+            self.set_gauge('form4_rule_entry_rejected_total', rule.entry_rejected, rule=rule.name)
+            self.set_gauge('form4_rule_document_rejected_total', rule.document_rejected, rule=rule.name)
+
+    def quantile(self, kind, label, q):
+        """Upper bucket bound at quantile q, the usual histogram estimate"""
+        hist = self.histograms[(kind, label)]
+        target = q * hist['count']
+        seen = 0
+        for bound, count in zip(METRICS_BUCKETS[kind], hist['buckets']):
+            seen += count
+            if seen >= target:
+                return min(bound, hist['max'])
+        return hist['max']
+
+    def summary(self):
+        """Everything measured so far as a JSON-friendly dict"""
+        with self.lock:
+            histograms = list(self.histograms.items())
+            gauges = list(self.gauges.items())
+        summary = {'started': self.started, 'finished': time.time(), 'stages': {}, 'alert_latency': {},
+                   'http': HTTP.stats(), 'filing_cache': FILING_CACHE.stats(), 'gauges': {}}
+        for (kind, label), hist in histograms:
+            summary['stages' if kind == 'stage' else 'alert_latency'][label] = {
+                'count': hist['count'],
+                'total_seconds': round(hist['sum'], 6),
+                'mean_seconds': round(hist['sum'] / hist['count'], 6),
+                'p50_seconds': round(self.quantile(kind, label, 0.5), 6),
+                'p95_seconds': round(self.quantile(kind, label, 0.95), 6),
+                'max_seconds': round(hist['max'], 6)
+            }
+        for (name, labels), value in gauges:
+            key = name + ''.join(f"[{v}]" for _, v in labels)
+            summary['gauges'][key] = value
+        return summary
+
+    @staticmethod
+    def label_value(value):
+        """Escape a label value as the text format requires: backslash, quote and newline"""
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    
+    def prometheus(self):
+        """Prometheus text exposition format (0.0.4)"""
+        lines = []
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            gauges = sorted(self.gauges.items())
+        
+        for kind, name, label_name, help_text in (
+                ('stage', 'form4_stage_duration_seconds', 'stage', 'Time spent per pipeline stage'),
+                ('latency', 'form4_alert_latency_seconds', 'destination',
+                 'EDGAR acceptance to alert delivered')):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (hist_kind, label), hist in histograms:
+                if hist_kind != kind:
+                    continue
+                label = self.label_value(label)
+                cumulative = 0
+                for bound, count in zip(METRICS_BUCKETS[kind], hist['buckets']):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{label_name}="{label}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{label_name}="{label}",le="+Inf"}} {hist["count"]}')
+                lines.append(f'{name}_sum{{{label_name}="{label}"}} {hist["sum"]:.6f}')
+                lines.append(f'{name}_count{{{label_name}="{label}"}} {hist["count"]}')
+        
+        http = HTTP.stats()
+        cache = FILING_CACHE.stats()
+        for name, kind, value in (('form4_http_requests_total', 'counter', http['requests']),
+                                  ('form4_http_not_modified_total', 'counter', http['not_modified']),
+                                  ('form4_http_received_bytes_total', 'counter', http['bytes_received']),
+                                  ('form4_http_connections_opened', 'gauge', http['connections_opened'])):
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+        lines.append("# TYPE form4_filing_cache_lookups_total counter")
+        for result in ('parsed_hits', 'raw_hits', 'misses'):
+            lines.append(f'form4_filing_cache_lookups_total{{result="{result}"}} {cache[result]}')
+        
+        typed = set()
+        for (name, labels), value in gauges:
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {'counter' if name.endswith('_total') else 'gauge'}")
+            label_text = ','.join(f'{key}="{self.label_value(val)}"' for key, val in labels)
+            lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+class HttpTransport:
+    """Keep-alive connection pool shared by all sec.gov and discord.com traffic
+    
+    Also remembers ETag/Last-Modified validators for conditional GETs and
+    counts requests, bytes and how often pooled connections were reused.
+    """
+
+    def __init__(self, pool_size=max(FETCH_WORKERS, BACKFILL_FETCH_WORKERS) + 2):
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': SEC_USER_AGENT,
+            'Accept-Encoding': 'gzip, deflate'
+        })
+        self.adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+        
+        self.validators = {}  # url -> {'etag': ..., 'last_modified': ...}
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.not_modified_count = 0
+        self.bytes_received = 0
+
+    def request(self, method, url, **kwargs):
+        """Send a request over the pooled session and record it"""
+        response = self.session.request(method, url, **kwargs)
+        with self.lock:
+            self.request_count += 1
+            self.bytes_received += len(response.content)
+            if response.status_code == 304:
+                self.not_modified_count += 1
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def conditional_get(self, url, headers=None, **kwargs):
+        """GET that sends stored validators, so unchanged resources return 304"""
+        headers = dict(headers or {})
+        known = self.validators.get(url, {})
+        if known.get('etag'):
+            headers['If-None-Match'] = known['etag']
+        if known.get('last_modified'):
+            headers['If-Modified-Since'] = known['last_modified']
+        
+        response = self.get(url, headers=headers, **kwargs)
+        
+        if response.status_code == 200:
+            fresh = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified')
+            }
+            if fresh['etag'] or fresh['last_modified']:
+                self.validators[url] = fresh
+        return response
+
+    def connections_opened(self):
+        """Number of TCP/TLS connections the pool has actually opened"""
+        pools = self.adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def stats(self):
+        """Snapshot of the transport counters"""
+        opened = self.connections_opened()
+        return {
+            'requests': self.request_count,
+            'not_modified': self.not_modified_count,
+            'connections_opened': opened,
+            'connections_reused': max(self.request_count - opened, 0),
+            'bytes_received': self.bytes_received
+        }
+
+
+class FilingStore:
+    """SQLite (WAL mode) record of every filing, keyed by accession number
+    
+    Each filing moves queued -> parsed -> notifying -> notified (or skipped),
+    and every status change is its own small transaction, so a crash
+    mid-batch resumes where it stopped instead of re-alerting or dropping
+    filings; an alert caught mid-delivery ('notifying') may already have
+    been sent, so it is dead-lettered rather than resent. Transient
+    failures park a filing as 'retry' until its backoff expires, then it
+    rejoins the backlog in its original position; after RETRY_MAX_ATTEMPTS
+    it is dead-lettered. The meta table holds the feed watermark and HTTP
+    validators.
+    
+    In sharded mode every filing also carries a shard (issuer CIK modulo the
+    worker count), and workers take filings with expiring leases instead of
+    reading the whole backlog.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS filings (
+            accession TEXT PRIMARY KEY,
+            filing_url TEXT NOT NULL,
+            title TEXT,
+            filing_date TEXT,
+            summary TEXT,
+            status TEXT NOT NULL,
+            xml_url TEXT,
+            first_seen REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt REAL NOT NULL DEFAULT 0,
+            last_error TEXT,
+            destinations TEXT,
+            issuer_cik INTEGER,
+            shard INTEGER,
+            lease_owner TEXT,
+            lease_expires REAL
+        );
+        CREATE INDEX IF NOT EXISTS filings_by_status ON filings (status);
+        CREATE INDEX IF NOT EXISTS filings_by_updated ON filings (updated_at);
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, path=STATE_DB):
+        # Generous busy timeout: in sharded mode several processes write here
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(self.SCHEMA)
+        self.add_missing_columns()
+        self.db.execute('CREATE INDEX IF NOT EXISTS filings_by_shard ON filings (shard, status)')
+
+    def add_missing_columns(self):
+        """Bring stores created before the retry queue or sharding up to the current schema"""
+        columns = {row['name'] for row in self.db.execute('PRAGMA table_info(filings)')}
+        with self.db:
+            for column, definition in (('attempts', 'INTEGER NOT NULL DEFAULT 0'),
+                                       ('next_attempt', 'REAL NOT NULL DEFAULT 0'),
+                                       ('last_error', 'TEXT'), ('destinations', 'TEXT'),
+                                       ('issuer_cik', 'INTEGER'), ('shard', 'INTEGER'),
+                                       ('lease_owner', 'TEXT'), ('lease_expires', 'REAL')):
+                if column not in columns:
+                    self.db.execute(f'ALTER TABLE filings ADD COLUMN {column} {definition}')
+
+    def __contains__(self, accession):
+        row = self.db.execute('SELECT 1 FROM filings WHERE accession = ?', (accession,)).fetchone()
+        return row is not None
+
+    def enqueue(self, filings, status='queued', shards=None):
+        """Insert filings not already known; returns how many were added
+        
+        With shards, each filing is assigned to a worker by its issuer CIK.
+        """
+        now = time.time()
+        rows = []
+        for f in filings:
+            cik = filing_cik(f)
+            rows.append((f['accession'], f['filing_url'], f.get('title'), f.get('filing_date'),
+                         f.get('summary'), status, f.get('xml_url'), now, now, cik,
+                         cik % shards if shards else None))
+        with self.db:
+            cursor = self.db.executemany(
+                'INSERT OR IGNORE INTO filings (accession, filing_url, title, filing_date, summary, '
+                'status, xml_url, first_seen, updated_at, issuer_cik, shard) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        return cursor.rowcount
+
+    def set_status(self, accession, status, xml_url=None):
+        """Record a filing's progress through the pipeline"""
+        with self.db:
+            self.db.execute(
+                'UPDATE filings SET status = ?, xml_url = COALESCE(?, xml_url), updated_at = ? '
+                'WHERE accession = ?', (status, xml_url, time.time(), accession))
+
+    def backlog(self, limit):
+        """Filings due to be worked on, in the order they were queued (oldest first)
+        
+        Retries whose backoff has expired are mixed in at their original place.
+        """
+        placeholders = ', '.join('?' * len(INACTIVE_STATUSES))
+        rows = self.db.execute(
+            f'SELECT * FROM filings WHERE status NOT IN ({placeholders}) AND next_attempt <= ? '
+            'ORDER BY rowid LIMIT ?', (*INACTIVE_STATUSES, time.time(), limit))
+        return [dict(row) for row in rows]
+
+    def backlog_size(self):
+        """How many filings are due to be worked on now"""
+        placeholders = ', '.join('?' * len(INACTIVE_STATUSES))
+        return self.db.execute(
+            f'SELECT COUNT(*) FROM filings WHERE status NOT IN ({placeholders}) AND next_attempt <= ?',
+            (*INACTIVE_STATUSES, time.time())).fetchone()[0]
+
+    def retry_size(self):
+        """How many filings are waiting out a retry backoff"""
+        return self.db.execute(
+            "SELECT COUNT(*) FROM filings WHERE status = 'retry' AND next_attempt > ?",
+            (time.time(),)).fetchone()[0]
+
+    def schedule_retry(self, accession, error, destinations=None, xml_url=None):
+        """Count a failed attempt and back off, or dead-letter the filing
+        
+        destinations limits the retry to the alert destinations that failed;
+        xml_url keeps a document URL that was resolved before the failure.
+        Returns (status, delay in seconds).
+        """
+        row = self.db.execute('SELECT attempts FROM filings WHERE accession = ?', (accession,)).fetchone()
+        attempts = (row['attempts'] if row else 0) + 1
+        status, delay = retry_backoff(attempts)
+        with self.db:
+            self.db.execute(
+                'UPDATE filings SET status = ?, attempts = ?, next_attempt = ?, last_error = ?, '
+                'destinations = ?, xml_url = COALESCE(?, xml_url), updated_at = ? WHERE accession = ?',
+                (status, attempts, time.time() + delay, error[:500],
+                 json.dumps(sorted(destinations)) if destinations else None, xml_url, time.time(), accession))
+        return status, delay
+
+    def dead_letters(self):
+        """Filings that ran out of retries, oldest first"""
+        rows = self.db.execute("SELECT * FROM filings WHERE status = 'dead' ORDER BY rowid")
+        return [dict(row) for row in rows]
+
+    def requeue_dead(self):
+        """Give every dead-lettered filing a fresh set of retries"""
+        with self.db:
+            cursor = self.db.execute(
+                "UPDATE filings SET status = 'retry', attempts = 0, next_attempt = 0, updated_at = ? "
+                "WHERE status = 'dead'", (time.time(),))
+        return cursor.rowcount
+
+    def reshard(self, shards):
+        """Assign every pending filing nobody holds a lease on to one of shards workers
+        
+        Covers filings queued before sharded mode and changes in the worker count.
+        Returns how many filings were (re)assigned.
+        """
+        now = time.time()
+        placeholders = ', '.join('?' * len(INACTIVE_STATUSES))
+        rows = self.db.execute(
+            f'SELECT accession, filing_url, issuer_cik FROM filings WHERE status NOT IN ({placeholders}) '
+            'AND (lease_owner IS NULL OR lease_expires < ?)', (*INACTIVE_STATUSES, now)).fetchall()
+        updates = []
+        for row in rows:
+            cik = row['issuer_cik'] if row['issuer_cik'] is not None else filing_cik(dict(row))
+            updates.append((cik, cik % shards, row['accession']))
+        with self.db:
+            self.db.executemany('UPDATE filings SET issuer_cik = ?, shard = ?, lease_owner = NULL, '
+                                'lease_expires = NULL WHERE accession = ?', updates)
+        return len(updates)
+
+    def lease(self, shard, owner, limit, seconds=SHARD_LEASE_SECONDS):
+        """Lease up to limit due filings of one shard to a worker, oldest first
+        
+        Filings whose lease ran out (their worker died or hung) are taken over.
+        """
+        now = time.time()
+        expires = now + seconds
+        placeholders = ', '.join('?' * len(INACTIVE_STATUSES))
+        # One statement, so two workers can never both win the same filing
+        with self.db:
+            self.db.execute(
+                'UPDATE filings SET lease_owner = ?, lease_expires = ? WHERE accession IN ('
+                f'SELECT accession FROM filings WHERE shard = ? AND status NOT IN ({placeholders}) '
+                'AND next_attempt <= ? AND (lease_owner IS NULL OR lease_owner = ? OR lease_expires < ?) '
+                'ORDER BY rowid LIMIT ?)', (owner, expires, shard, *INACTIVE_STATUSES, now, owner, now, limit))
+        rows = self.db.execute('SELECT * FROM filings WHERE lease_owner = ? AND lease_expires = ? ORDER BY rowid',
+                               (owner, expires))
+        return [dict(row) for row in rows]
+
+    def renew_leases(self, owner, seconds=SHARD_LEASE_SECONDS):
+        """Extend a worker's leases on filings it hasn't finished"""
+        placeholders = ', '.join('?' * len(TERMINAL_STATUSES))
+        with self.db:
+            self.db.execute(
+                f'UPDATE filings SET lease_expires = ? WHERE lease_owner = ? AND status NOT IN ({placeholders})',
+                (time.time() + seconds, owner, *TERMINAL_STATUSES))
+
+    def release_leases(self, owner):
+        """Hand a stopping worker's filings back, except alerts still being delivered"""
+        with self.db:
+            self.db.execute("UPDATE filings SET lease_owner = NULL, lease_expires = NULL "
+                            "WHERE lease_owner = ? AND status != 'notifying'", (owner,))
+
+    def lease_owners(self, shard):
+        """Workers currently holding leases on a shard's filings"""
+        rows = self.db.execute('SELECT DISTINCT lease_owner FROM filings WHERE shard = ? '
+                               'AND lease_owner IS NOT NULL', (shard,))
+        return [row['lease_owner'] for row in rows]
+
+    def expire_leases(self, owner):
+        """End a worker's leases now, e.g. once it is known to be dead"""
+        with self.db:
+            cursor = self.db.execute('UPDATE filings SET lease_expires = 0 WHERE lease_owner = ?', (owner,))
+        return cursor.rowcount
+
+    def claim_alert(self, accession, owner=None):
+        """Mark a filing 'notifying' just before its alert is queued
+        
+        With an owner this only succeeds while that worker still holds the
+        filing's lease, and it extends the lease to cover the delivery, so a
+        worker that lost its filings can't alert on them a second time.
+        Returns whether the alert may be sent.
+        """
+        now = time.time()
+        with self.db:
+            cursor = self.db.execute(
+                "UPDATE filings SET status = 'notifying', updated_at = ?, "
+                "lease_expires = CASE WHEN ? IS NULL THEN lease_expires ELSE ? END "
+                "WHERE accession = ? AND status != 'notifying' "
+                "AND (? IS NULL OR (lease_owner = ? AND lease_expires > ?))",
+                (now, owner, now + SHARD_LEASE_SECONDS, accession, owner, owner, now))
+        return cursor.rowcount == 1
+
+    def abandon_interrupted(self):
+        """Dead-letter alerts whose process stopped while they were being delivered
+        
+        There is no telling whether the webhook got them, so rather than risk a
+        duplicate they wait in the dead-letter list for retry-dead. Alerts
+        claimed by a sharded worker are only taken once its lease runs out.
+        """
+        now = time.time()
+        with self.db:
+            cursor = self.db.execute(
+                "UPDATE filings SET status = 'dead', last_error = ?, lease_owner = NULL, "
+                "lease_expires = NULL, updated_at = ? "
+                "WHERE status = 'notifying' AND (lease_expires IS NULL OR lease_expires < ?)",
+                ('stopped mid-delivery; not resent automatically', now, now))
+        return cursor.rowcount
+
+    def xml_urls(self):
+        """accession -> XML URL for every filing whose document is known"""
+        rows = self.db.execute('SELECT accession, xml_url FROM filings WHERE xml_url IS NOT NULL')
+        return {row['accession']: row['xml_url'] for row in rows}
+
+    def get_meta(self, key, default=None):
+        row = self.db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return json.loads(row['value']) if row else default
+
+    def set_meta(self, key, value):
+        with self.db:
+            self.db.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, json.dumps(value)))
+
+    def evict(self, days=STATE_RETENTION_DAYS, unalerted_days=SEEN_RETENTION_DAYS):
+        """Forget finished filings older than the retention window, and trim the rest
+        
+        Filings that were never alerted on go after unalerted_days; they only
+        need to outlast the watermark overlap. Finished filings lose their feed
+        title and summary, and the file is compacted once a quarter of it is
+        free pages, so the committed database stays small.
+        """
+        now = time.time()
+        placeholders = ', '.join('?' * len(TERMINAL_STATUSES))
+        unalerted = ', '.join('?' * len(UNALERTED_STATUSES))
+        trimmed = ', '.join('?' * len(TRIMMED_STATUSES))
+        with self.db:
+            cursor = self.db.execute(
+                f'DELETE FROM filings WHERE status IN ({placeholders}) AND updated_at < ?',
+                (*TERMINAL_STATUSES, now - days * 86400))
+            evicted = cursor.rowcount
+            cursor = self.db.execute(
+                f'DELETE FROM filings WHERE status IN ({unalerted}) AND updated_at < ?',
+                (*UNALERTED_STATUSES, now - unalerted_days * 86400))
+            evicted += cursor.rowcount
+            self.db.execute(
+                f'UPDATE filings SET title = NULL, summary = NULL WHERE status IN ({trimmed}) '
+                'AND (title IS NOT NULL OR summary IS NOT NULL)', TRIMMED_STATUSES)
+        
+        free_pages = self.db.execute('PRAGMA freelist_count').fetchone()[0]
+        if free_pages * 4 > self.db.execute('PRAGMA page_count').fetchone()[0]:
+            try:
+                self.db.execute('VACUUM')
+            except sqlite3.OperationalError:
+                pass  # Another process is using the store; compact on a later cycle
+        return evicted
+
+    def close(self):
+        """Fold the WAL back into the main file so the database is self-contained"""
+        self.db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        self.db.close()
+
+
+def embed_size(embed):
+    """Characters Discord counts toward its per-message embed limit"""
+    size = len(embed.get('title', '')) + len(embed.get('description', ''))
+    size += len(embed.get('footer', {}).get('text', '')) + len(embed.get('author', {}).get('name', ''))
+    for field in embed.get('fields', []):
+        size += len(field.get('name', '')) + len(field.get('value', ''))
+    return size
+
+def retry_after_seconds(response):
+    """How long a 429 asks us to wait
+    
+    Discord puts retry_after in the JSON body; other webhooks send a
+    Retry-After header in seconds or as an HTTP date. Anything unreadable
+    waits DISCORD_RETRY_BASE.
+    """
+    try:
+        return max(float(response.json()['retry_after']), 0.0)
+    except (ValueError, TypeError, KeyError, IndexError):
+        pass
+    header = response.headers.get('Retry-After', '')
+    try:
+        return max(float(header), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(header) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError, IndexError):
+        return DISCORD_RETRY_BASE
+
+
+class DiscordDelivery:
+    """Background sender that packs embeds into as few webhook messages as possible
+    
+    Embeds go out in the order they were submitted (urgent ones first), up to
+    Discord's 10 per message. Posting is paced by the X-RateLimit-Remaining/
+    Reset-After headers, and 429s and 5xx responses are retried with backoff.
+    All of that happens on this destination's own sender thread, so fetching,
+    parsing and other destinations never wait on it.
+    """
+
+    label = 'Discord'
+    unit = 'embed(s)'
+    max_batch = DISCORD_MAX_EMBEDS
+    max_batch_chars = DISCORD_MAX_EMBED_CHARS
+
+    def __init__(self, webhook_url, name=None, headers=None):
+        self.webhook_url = webhook_url
+        self.name = name
+        self.headers = headers
+        if name:
+            self.label = f"{self.label} [{name}]"
+        self.pending = deque()
+        self.results = deque()
+        self.in_flight = 0
+        self.closing = False
+        self.blocked_until = 0.0
+        self.condition = threading.Condition()
+        self.messages_sent = 0
+        self.embeds_sent = 0
+        self.thread = threading.Thread(target=self._run, name=f"delivery-{name or 'discord'}", daemon=True)
+        self.thread.start()
+
+    def submit(self, embed, key=None, urgent=False):
+        """Queue an embed; key is handed back through completed()
+        
+        Urgent embeds jump ahead of everything still waiting to be sent.
+        """
+        with self.condition:
+            if urgent:
+                self.pending.appendleft((embed, key))
+            else:
+                self.pending.append((embed, key))
+            self.condition.notify_all()
+
+    def queue_depth(self):
+        with self.condition:
+            return len(self.pending) + self.in_flight
+
+    def flush(self):
+        """Block until everything submitted so far has been sent or given up on"""
+        with self.condition:
+            while self.pending or self.in_flight:
+                self.condition.wait()
+
+    def close(self):
+        """Flush and stop the sender thread"""
+        self.flush()
+        with self.condition:
+            self.closing = True
+            self.condition.notify_all()
+        self.thread.join()
+
+    def completed(self):
+        """(key, delivered) for every embed finished since the last call"""
+        with self.condition:
+            done = list(self.results)
+            self.results.clear()
+        return done
+
+    def _take_batch(self):
+        with self.condition:
+            while not self.pending and not self.closing:
+                self.condition.wait()
+            if not self.pending:
+                return None
+            
+            # Give a burst a moment to fill the message before sending
+            deadline = time.monotonic() + DISCORD_BATCH_LINGER
+            while len(self.pending) < self.max_batch and time.monotonic() < deadline:
+                self.condition.wait(deadline - time.monotonic())
+            
+            batch = []
+            size = 0
+            while self.pending and len(batch) < self.max_batch:
+                next_size = self.item_size(self.pending[0][0])
+                if batch and size + next_size > self.max_batch_chars:
+                    break
+                batch.append(self.pending.popleft())
+                size += next_size
+            self.in_flight = len(batch)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            
+            # Whatever happens, the batch is settled, or flush() would wait forever
+            delivered = False
+            try:
+                with METRICS.timed('deliver'):
+                    delivered = self._post(self.build_message([item for item, _ in batch]), len(batch))
+                if delivered:
+                    for _, key in batch:
+                        METRICS.alert_delivered(key, self.name or 'discord')
+            except Exception as e:
+                print(f"  ✗ {self.label}: sending {len(batch)} {self.unit} failed: {e}")
+            finally:
+                with self.condition:
+                    self.results.extend((key, delivered) for _, key in batch)
+                    self.in_flight = 0
+                    if delivered:
+                        self.messages_sent += 1
+                        self.embeds_sent += len(batch)
+                    self.condition.notify_all()
+
+    def item_size(self, embed):
+        return embed_size(embed)
+
+    def build_message(self, embeds):
+        return {"embeds": embeds}
+
+    def _post(self, payload, count):
+        """POST one message, retrying 429/5xx; returns whether it was accepted"""
+        for attempt in range(1, DISCORD_MAX_ATTEMPTS + 1):
+            wait = self.blocked_until - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            
+            try:
+                response = HTTP.post(self.webhook_url, json=payload, headers=self.headers, timeout=10)
+            except requests.RequestException as e:
+                error = str(e)
+            else:
+                self._track_rate_limit(response)
+                
+                if response.status_code < 300:
+                    print(f"  ✓ {self.label}: delivered {count} {self.unit} in one message")
+                    return True
+                
+                if response.status_code == 429:
+                    retry_after = retry_after_seconds(response)
+                    self.blocked_until = time.monotonic() + retry_after
+                    print(f"  ⏳ {self.label} rate limited, retrying in {retry_after:.2f}s")
+                    continue
+                
+                if response.status_code < 500:
+                    print(f"  ✗ {self.label} rejected message ({response.status_code}): {response.text[:200]}")
+                    return False
+                
+                error = f"HTTP {response.status_code}"
+            
+            if attempt == DISCORD_MAX_ATTEMPTS:
+                print(f"  ✗ {self.label} error: {error} (attempt {attempt}/{DISCORD_MAX_ATTEMPTS})")
+                break
+            delay = min(DISCORD_RETRY_BASE * 2 ** (attempt - 1), 30)
+            print(f"  ✗ {self.label} error: {error} (attempt {attempt}/{DISCORD_MAX_ATTEMPTS}, retrying in {delay:.0f}s)")
+            time.sleep(delay)
+        
+        print(f"  ✗ {self.label}: giving up on {count} {self.unit}")
+        return False
+
+    def _track_rate_limit(self, response):
+        """Hold off the next post when Discord says the bucket is empty"""
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset_after = response.headers.get('X-RateLimit-Reset-After')
+        if remaining == '0' and reset_after:
+            try:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + float(reset_after))
+            except ValueError:
+                pass  # Not Discord's format; a 429 will say how long to wait
+
+
+class JsonWebhookDelivery(DiscordDelivery):
+    """Background sender for a generic JSON webhook
+    
+    Posts {"alerts": [...]} batches of structured alert records, with the
+    same ordering, pacing and retries as the Discord sender.
+    """
+
+    label = 'Webhook'
+    unit = 'alert(s)'
+    max_batch = JSON_WEBHOOK_MAX_BATCH
+    max_batch_chars = float('inf')
+
+    def item_size(self, record):
+        return 0
+
+    def build_message(self, records):
+        return {"alerts": records}
+
+
+class AlertRouter:
+    """Fans alerts out to every destination they route to
+    
+    Routes map tickers, rule names and severities to destinations. They are
+    indexed by key when the table is loaded, so finding an alert's
+    destinations costs a few dict lookups however many routes there are.
+    Alerts that match no route go to the default destinations. Each
+    destination has its own sender thread and rate limit state, so a slow
+    or rate-limited endpoint only delays its own alerts.
+    
+    Offers the same submit/close interface as a single sender; completed()
+    reports, per alert, the destinations that failed to take it.
+    """
+
+    def __init__(self, destinations, routes=(), default=('discord',)):
+        self.deliveries = {}
+        for name, spec in destinations.items():
+            url = spec.get('url') or os.environ.get(spec.get('url_env', ''))
+            if not url:
+                raise ValueError(f"Destination '{name}' has no url (or its url_env is unset)")
+            kind = DiscordDelivery if spec.get('type', 'discord') == 'discord' else JsonWebhookDelivery
+            self.deliveries[name] = kind(url, name=name if len(destinations) > 1 else None,
+                                         headers=spec.get('headers'))
+        
+        self.by_ticker = {}
+        self.by_rule = {}
+        self.by_severity = {}
+        for route in routes:
+            for index, keys in ((self.by_ticker, [normalize_ticker(t) for t in route.get('tickers', [])]),
+                                (self.by_rule, route.get('rules', [])),
+                                (self.by_severity, route.get('severities', []))):
+                for key in keys:
+                    index.setdefault(key, set()).update(route['to'])
+        self.default = set(default)
+        
+        unknown = set().union(self.default, *self.by_ticker.values(), *self.by_rule.values(),
+                              *self.by_severity.values()) - set(self.deliveries)
+        if unknown:
+            raise ValueError(f"Routes point at unknown destination(s): {', '.join(sorted(unknown))}")
+        
+        self.outstanding = {}  # key -> [destinations still sending, destinations that failed]
+
+    def destinations_for(self, ticker=None, rules=(), severity='filing'):
+        names = set(self.by_severity.get(severity, ()))
+        if ticker:
+            names |= self.by_ticker.get(normalize_ticker(ticker), set())
+        for rule in rules:
+            names |= self.by_rule.get(rule, set())
+        return names or self.default
+
+    def submit(self, embed, key=None, urgent=False, ticker=None, rules=(), severity='filing', record=None,
+               only=None):
+        """Queue an alert for each of its destinations
+        
+        Discord destinations get the embed; JSON webhooks get the record, or
+        the embed wrapped in one when no record is given. only narrows the
+        destinations, e.g. to the ones a retried alert failed on.
+        """
+        names = self.destinations_for(ticker, rules, severity)
+        if only:
+            names = (names & set(only)) or (set(only) & set(self.deliveries)) or names
+        if key is not None:
+            self.outstanding[key] = [len(names), []]
+        for name in names:
+            delivery = self.deliveries[name]
+            if isinstance(delivery, JsonWebhookDelivery):
+                delivery.submit(record or {'type': severity, 'embed': embed}, key, urgent)
+            else:
+                delivery.submit(embed, key, urgent)
+
+    def queue_depth(self):
+        return sum(delivery.queue_depth() for delivery in self.deliveries.values())
+
+    def flush(self):
+        for delivery in self.deliveries.values():
+            delivery.flush()
+
+    def close(self):
+        for delivery in self.deliveries.values():
+            delivery.close()
+
+    def completed(self):
+        """(key, failed destination names) for every alert all its destinations are done with"""
+        done = []
+        for name, delivery in self.deliveries.items():
+            for key, delivered in delivery.completed():
+                if key is None or key not in self.outstanding:
+                    done.append((key, [] if delivered else [name]))
+                    continue
+                state = self.outstanding[key]
+                state[0] -= 1
+                if not delivered:
+                    state[1].append(name)
+                if not state[0]:
+                    del self.outstanding[key]
+                    done.append((key, state[1]))
+        return done
+
+    def print_stats(self):
+        for delivery in self.deliveries.values():
+            print(f"📨 {delivery.label}: {delivery.embeds_sent} {delivery.unit} in {delivery.messages_sent} message(s)")
+
+
+class FilingCache:
+    """On-disk cache of raw Form 4 XML and parsed details, keyed by accession number
+    
+    Accepted filings never change, so the accession number is a stable content
+    key. Raw XML is stored gzipped; parsed details are stored as JSON tagged
+    with PARSER_VERSION, so a parser upgrade re-parses from the cached XML
+    instead of downloading again. Hits refresh a file's mtime, and evict()
+    removes the least recently used files once the cache exceeds max_bytes.
+    """
+
+    def __init__(self, root=FILING_CACHE_DIR, max_bytes=FILING_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.total_bytes = None  # Unknown until the first evict() walks the cache
+        self.lock = threading.Lock()
+        self.raw_hits = 0
+        self.parsed_hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def path(self, accession, suffix):
+        # Fan out on the sequence number so no directory gets huge
+        return os.path.join(self.root, accession[-2:], accession + suffix)
+
+    def read(self, path):
+        # Another process's evict() may delete the file at any point
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            return None
+        return data
+
+    def write(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        with self.lock:
+            self.writes += 1
+            if self.total_bytes is not None:
+                self.total_bytes += len(data)
+
+    def count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get_raw(self, accession):
+        """Raw XML bytes for a filing, or None"""
+        data = self.read(self.path(accession, '.xml.gz')) if accession else None
+        try:
+            content = gzip.decompress(data) if data is not None else None
+        except (OSError, EOFError):  # Truncated or corrupt; refetched and rewritten
+            content = None
+        if content is None:
+            self.count('misses')
+            return None
+        self.count('raw_hits')
+        return content
+
+    def put_raw(self, accession, content):
+        if accession:
+            self.write(self.path(accession, '.xml.gz'), gzip.compress(content))
+
+    def get_parsed(self, accession):
+        """Parsed details for a filing if they came from the current parser, or None
+        
+        An entry that can't be read back is treated as a miss, so the filing
+        is parsed again and the entry rewritten.
+        """
+        data = self.read(self.path(accession, '.json')) if accession else None
+        if data is None:
+            return None
+        try:
+            record = json.loads(data)
+            if record.get('parser_version') != PARSER_VERSION:
+                return None
+            details = Form4Filing.from_dict(record['details'])
+        except (ValueError, TypeError, KeyError, AttributeError):
+            return None
+        self.count('parsed_hits')
+        return details
+
+    def put_parsed(self, accession, details):
+        if accession:
+            record = {'parser_version': PARSER_VERSION, 'details': details.to_dict()}
+            self.write(self.path(accession, '.json'), json.dumps(record).encode())
+
+    def evict(self):
+        """Delete least recently used files until the cache fits in max_bytes"""
+        if self.total_bytes is not None and self.total_bytes <= self.max_bytes:
+            return 0, self.total_bytes
+        
+        files = []
+        total = 0
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        
+        self.total_bytes = total
+        return removed, total
+
+    def stats(self):
+        with self.lock:
+            lookups = self.parsed_hits + self.raw_hits + self.misses
+            return {
+                'parsed_hits': self.parsed_hits,
+                'raw_hits': self.raw_hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'hit_rate': (self.parsed_hits + self.raw_hits) / lookups if lookups else 0.0
+            }
+
+
+class HistoryStore:
+    """SQLite archive of parsed filings, from backfills and the live pipeline
+    
+    Every stored filing's transactions are also kept one row each in an
+    indexed transactions table, which query() reads. Also checkpoints which
+    index files a backfill has fully processed, so a rerun skips straight to
+    unfinished work.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS parsed_filings (
+            accession TEXT PRIMARY KEY,
+            issuer_cik TEXT,
+            ticker TEXT,
+            form TEXT,
+            filed TEXT,
+            filing_url TEXT,
+            details TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS backfill_sources (
+            source TEXT PRIMARY KEY,
+            completed_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS transactions (
+            accession TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            filed TEXT NOT NULL,
+            issuer_cik INTEGER,
+            issuer_name TEXT,
+            ticker TEXT,
+            owner_cik INTEGER,
+            owner_name TEXT COLLATE NOCASE,
+            owner_title TEXT,
+            is_director INTEGER NOT NULL,
+            is_officer INTEGER NOT NULL,
+            is_ten_percent_owner INTEGER NOT NULL,
+            security TEXT,
+            is_derivative INTEGER NOT NULL,
+            date TEXT,
+            code TEXT,
+            type TEXT,
+            shares REAL,
+            price REAL,
+            price_note TEXT,
+            amount REAL NOT NULL,
+            is_buy INTEGER NOT NULL,
+            is_sell INTEGER NOT NULL,
+            PRIMARY KEY (accession, seq)
+        );
+        -- Each lookup column leads an index that continues in result order,
+        -- so a page is read straight off the index, newest filing first
+        CREATE INDEX IF NOT EXISTS transactions_by_filed ON transactions (filed, accession, seq);
+        CREATE INDEX IF NOT EXISTS transactions_by_ticker ON transactions (ticker, filed, accession, seq);
+        CREATE INDEX IF NOT EXISTS transactions_by_issuer ON transactions (issuer_cik, filed, accession, seq);
+        CREATE INDEX IF NOT EXISTS transactions_by_owner_cik ON transactions (owner_cik, filed, accession, seq);
+        CREATE INDEX IF NOT EXISTS transactions_by_owner_name ON transactions (owner_name, filed, accession, seq);
+        CREATE INDEX IF NOT EXISTS transactions_by_code ON transactions (code, filed, accession, seq);
+    """
+    
+    TRANSACTION_COLUMNS = ('accession', 'seq', 'filed', 'issuer_cik', 'issuer_name', 'ticker', 'owner_cik',
+                           'owner_name', 'owner_title', 'is_director', 'is_officer', 'is_ten_percent_owner',
+                           'security', 'is_derivative', 'date', 'code', 'type', 'shares', 'price', 'price_note',
+                           'amount', 'is_buy', 'is_sell')
+    
+    def __init__(self, path=HISTORY_DB, readonly=False):
+        self.readonly = readonly
+        if readonly:
+            # For the query server: one short-lived connection per request
+            self.db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            self.db.row_factory = sqlite3.Row
+            return
+        # Workers in sharded mode write here concurrently
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.executescript(self.SCHEMA)
+        indexed = self.index_existing()
+        if indexed:
+            print(f"✓ Indexed {indexed} transaction(s) from previously stored filings")
+
+    def __contains__(self, accession):
+        row = self.db.execute('SELECT 1 FROM parsed_filings WHERE accession = ?', (accession,)).fetchone()
+        return row is not None
+
+    def add_filings(self, records):
+        """Store (filing, details) pairs and index their transactions, in one transaction"""
+        rows = [(filing['accession'], details.cik, details.ticker, filing.get('form'),
+                 filed_day(filing), filing.get('filing_url'), json.dumps(details.to_dict()))
+                for filing, details in records]
+        with self.db:
+            self.db.executemany(
+                'INSERT OR REPLACE INTO parsed_filings (accession, issuer_cik, ticker, form, filed, '
+                'filing_url, details) VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            self.index_transactions((filing['accession'], filed_day(filing), details)
+                                    for filing, details in records)
+    
+    def index_transactions(self, filings):
+        """(Re)write the transaction rows of (accession, filed, details) triples"""
+        filings = list(filings)
+        self.db.executemany('DELETE FROM transactions WHERE accession = ?',
+                            [(accession,) for accession, _, _ in filings])
+        rows = []
+        for accession, filed, details in filings:
+            owner = details.owner or ReportingOwner()
+            for seq, trans in enumerate(details.transactions):
+                rows.append((accession, seq, filed or '', issuer_cik_number(details.cik), details.issuer_name,
+                             details.ticker.upper(), issuer_cik_number(owner.cik), owner.name, owner.title,
+                             owner.is_director, owner.is_officer, owner.is_ten_percent_owner,
+                             trans.security, trans.is_derivative, trans.date, trans.code, trans.type,
+                             trans.shares, trans.price, trans.price_note, trans.amount, trans.is_buy, trans.is_sell))
+        placeholders = ', '.join('?' * len(self.TRANSACTION_COLUMNS))
+        self.db.executemany(f"INSERT INTO transactions ({', '.join(self.TRANSACTION_COLUMNS)}) "
+                            f"VALUES ({placeholders})", rows)
+    
+    def index_existing(self, chunk_size=10000):
+        """Fill an empty transactions table from filings stored before it existed"""
+        if (self.db.execute('SELECT 1 FROM transactions LIMIT 1').fetchone()
+                or not self.db.execute('SELECT 1 FROM parsed_filings LIMIT 1').fetchone()):
+            return 0
+        cursor = self.db.execute('SELECT accession, filed, details FROM parsed_filings')
+        with self.db:
+            while True:
+                chunk = cursor.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                self.index_transactions((row['accession'], filed_day({'filed': row['filed']}),
+                                         Form4Filing.from_dict(json.loads(row['details']))) for row in chunk)
+        return self.db.execute('SELECT COUNT(*) FROM transactions').fetchone()[0]
+    
+    def query(self, ticker=None, cik=None, owner=None, owner_cik=None, codes=None, roles=None,
+              min_value=None, since=None, until=None, cursor=None, limit=QUERY_PAGE_SIZE):
+        """Yield (accession, filed, Form4Filing) for filings with a matching transaction, newest first
+        
+        Every filter is optional and they all have to hold for a transaction;
+        each Form4Filing carries only its matching transactions. Rows are read
+        from the database as the generator is consumed. cursor continues after
+        a result, given as HistoryStore.cursor(filed, accession). Raises
+        ValueError for an unknown role.
+        """
+        clauses = []
+        params = []
+        for column, value in (('ticker', ticker and ticker.upper()), ('issuer_cik', cik),
+                              ('owner_cik', owner_cik), ('owner_name', owner)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if codes:
+            # Unary + keeps the planner off the code index when a far more selective one applies
+            narrowed = any(value is not None for value in (ticker, cik, owner, owner_cik))
+            clauses.append(f"{'+code' if narrowed else 'code'} IN ({', '.join('?' * len(codes))})")
+            params.extend(codes)
+        if roles:
+            unknown = set(roles) - set(RULE_ROLES)
+            if unknown:
+                raise ValueError(f"unknown role(s) {sorted(unknown)}, expected some of {sorted(RULE_ROLES)}")
+            clauses.append('(' + ' OR '.join(f"{RULE_ROLES[role]} = 1" for role in roles) + ')')
+        if min_value is not None:
+            clauses.append('amount >= ?')
+            params.append(min_value)
+        if since:
+            clauses.append('filed >= ?')
+            params.append(since)
+        if until:
+            clauses.append('filed <= ?')
+            params.append(until)
+        if cursor:
+            filed, _, accession = cursor.partition('|')
+            clauses.append('(filed, accession) < (?, ?)')
+            params.extend((filed, accession))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        rows = self.db.execute(f"SELECT * FROM transactions {where} ORDER BY filed DESC, accession DESC, seq",
+                               params)
+        
+        returned = 0
+        group = []
+        try:
+            for row in rows:
+                if group and row['accession'] != group[0]['accession']:
+                    yield group[0]['accession'], group[0]['filed'], self.filing_from_rows(group)
+                    returned += 1
+                    group = []
+                    if returned >= limit:
+                        return
+                group.append(row)
+            if group:
+                yield group[0]['accession'], group[0]['filed'], self.filing_from_rows(group)
+        finally:
+            rows.close()  # A statement left open would block the checkpoint in close()
+    
+    @staticmethod
+    def cursor(filed, accession):
+        """Opaque continuation token for query()"""
+        return f"{filed}|{accession}"
+    
+    @staticmethod
+    def filing_from_rows(rows):
+        """Rebuild the parser's Form4Filing from one filing's transaction rows"""
+        first = rows[0]
+        owner = ReportingOwner(name=first['owner_name'], title=first['owner_title'],
+                               cik=str(first['owner_cik'] or ''), is_director=bool(first['is_director']),
+                               is_officer=bool(first['is_officer']),
+                               is_ten_percent_owner=bool(first['is_ten_percent_owner']))
+        transactions = [Transaction(security=row['security'], is_derivative=bool(row['is_derivative']),
+                                    date=row['date'], code=row['code'], type=row['type'], shares=row['shares'],
+                                    price=row['price'], price_note=row['price_note'], amount=row['amount'],
+                                    is_buy=bool(row['is_buy']), is_sell=bool(row['is_sell'])) for row in rows]
+        return Form4Filing(issuer_name=first['issuer_name'], ticker=first['ticker'],
+                           cik=str(first['issuer_cik'] or 'N/A'), owner=owner, transactions=transactions,
+                           has_buy=any(t.is_buy for t in transactions),
+                           has_sell=any(t.is_sell for t in transactions),
+                           total_value=sum(t.amount for t in transactions))
+
+    def source_done(self, source):
+        row = self.db.execute('SELECT 1 FROM backfill_sources WHERE source = ?', (source,)).fetchone()
+        return row is not None
 
-def load_last_filings():
-    """Load the last seen filings from state file"""
-    if os.path.exists(STATE_FILE):
-        with open(STATE_FILE, 'r') as f:
-            return json.load(f)
-    return []
+    def mark_source_done(self, source):
+        with self.db:
+            self.db.execute('INSERT OR REPLACE INTO backfill_sources (source, completed_at) VALUES (?, ?)',
+                            (source, time.time()))
 
-def save_last_filings(filings):
-    """Save the current filings to state file"""
-    with open(STATE_FILE, 'w') as f:
-        json.dump(filings, f)
+    def close(self):
+        if not self.readonly:
+            self.db.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        self.db.close()
+
+
+class TransactionExporter:
+    """Buffers transaction rows and writes them out as day-partitioned files
+    
+    Rows are collected column by column in memory and only written when a
+    row group fills, the oldest row has waited EXPORT_MAX_LINGER seconds, or
+    on close, so alerting never waits on disk. Each flush writes one new part
+    file per filing day under <directory>/filed=YYYY-MM-DD/ (Parquet or Arrow
+    IPC via pyarrow), or appends to a transactions.csv there for 'csv' or
+    when pyarrow is not installed.
+    """
+
+    COLUMNS = ('accession', 'issuer_cik', 'ticker', 'issuer_name', 'owner_cik', 'owner_name', 'owner_role',
+               'code', 'type', 'security', 'is_derivative', 'shares', 'price', 'amount',
+               'transaction_date', 'filing_date')
+
+    def __init__(self, fmt=EXPORT_FORMAT, directory=EXPORT_DIR, row_group_size=EXPORT_ROW_GROUP_SIZE):
+        if fmt in ('parquet', 'arrow') and pa is None:
+            print(f"⚠ pyarrow is not installed, exporting CSV instead of {fmt}")
+            fmt = 'csv'
+        self.fmt = fmt
+        self.directory = directory
+        self.row_group_size = row_group_size
+        self.pending = {}  # filing day -> {column: [values]}
+        self.buffered = 0
+        self.oldest = None
+        self.rows_written = 0
+        self.files_written = 0
+
+    def add(self, filing, details):
+        """Buffer one row per transaction of a parsed filing"""
+        if not details or not details.transactions:
+            return
+        day = (filing.get('filing_date') or filing.get('filed') or 'unknown')[:10]
+        columns = self.pending.setdefault(day, {name: [] for name in self.COLUMNS})
+        owner = details.owner or ReportingOwner()
+        
+        for trans in details.transactions:
+            for name, value in (('accession', filing['accession']), ('issuer_cik', details.cik),
+                                ('ticker', details.ticker), ('issuer_name', details.issuer_name),
+                                ('owner_cik', owner.cik), ('owner_name', owner.name),
+                                ('owner_role', owner.title), ('code', trans.code), ('type', trans.type),
+                                ('security', trans.security), ('is_derivative', trans.is_derivative),
+                                ('shares', trans.shares), ('price', trans.price), ('amount', trans.amount),
+                                ('transaction_date', trans.date), ('filing_date', day)):
+                columns[name].append(value)
+        
+        self.buffered += len(details.transactions)
+        if self.oldest is None:
+            self.oldest = time.monotonic()
+        if self.buffered >= self.row_group_size:
+            self.flush()
+
+    def due(self):
+        """True once buffered rows have waited long enough to be written"""
+        return self.oldest is not None and time.monotonic() - self.oldest >= EXPORT_MAX_LINGER
+
+    def flush(self):
+        """Write every buffered day out and clear the buffer"""
+        for day, columns in self.pending.items():
+            partition = os.path.join(self.directory, f"filed={day}")
+            os.makedirs(partition, exist_ok=True)
+            try:
+                if self.fmt == 'csv':
+                    self.append_csv(partition, columns)
+                else:
+                    self.write_part(partition, columns)
+                self.rows_written += len(columns['accession'])
+            except Exception as e:
+                print(f"✗ Could not export {len(columns['accession'])} row(s) for {day}: {e}")
+        self.pending = {}
+        self.buffered = 0
+        self.oldest = None
+
+    def write_part(self, partition, columns):
+        table = pa.table(columns, schema=EXPORT_SCHEMA)
+        name = f"part-{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}-{os.getpid()}"
+        path = os.path.join(partition, f"{name}.{self.fmt}")
+        # Write under a temporary name so a reader never picks up half a file
+        tmp_path = f"{path}.tmp"
+        if self.fmt == 'parquet':
+            pq.write_table(table, tmp_path, compression='zstd')
+        else:
+            with pa.OSFile(tmp_path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        self.files_written += 1
+
+    def append_csv(self, partition, columns):
+        path = os.path.join(partition, 'transactions.csv')
+        new_file = not os.path.exists(path)
+        with open(path, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(self.COLUMNS)
+                self.files_written += 1
+            writer.writerows(zip(*(columns[name] for name in self.COLUMNS)))
+
+    def close(self):
+        if self.buffered:
+            self.flush()
+
+
+class ClusterDetector:
+    """Rolling per-ticker window of open-market buys and sells
+    
+    Every event sits in one time-ordered deque. Each ticker keeps running
+    totals (buy and sell dollars, and a count of buy events per insider)
+    that are adjusted as events enter and as expired ones drop off the front,
+    so each transaction costs O(1) and tickers that go quiet cost nothing.
+    add() returns an alert for every ticker whose window has just crossed
+    the CLUSTER_* thresholds.
+    
+    A ticker alerts once per window, so an alert whose delivery failed is
+    kept here and retried with the filing store's backoff (see
+    retry_cluster_alerts()) instead of waiting for the window to fire again.
+    """
+
+    def __init__(self, window_days=CLUSTER_WINDOW_DAYS):
+        self.window = timedelta(days=window_days)
+        self.events = deque()  # (day, ticker, owner, name, buy_value, sell_value)
+        self.tickers = {}      # ticker -> running aggregates for its window
+        self.accessions = set()  # Filings in the window, so a re-parse is not counted twice
+        self.arrivals = deque()  # (day, accession) in arrival order, to expire them
+        self.alerted = {}        # ticker -> day of its last cluster alert
+        self.sending = {}        # key -> (cluster, attempts) for alerts handed to the delivery
+        self.retries = {}        # key -> failed alert waiting for its next attempt
+        self.newest = None
+
+    def add(self, filing, details):
+        """Fold a parsed filing into the window; returns cluster alerts it triggers"""
+        if not details or not details.transactions or filing['accession'] in self.accessions:
+            return []
+        day = parse_feed_time(filing.get('filing_date') or filing.get('filed'))
+        if day is None:
+            return []
+        day = day.date()
+        owner = details.owner or ReportingOwner()
+        
+        self.accessions.add(filing['accession'])
+        self.arrivals.append((day, filing['accession']))
+        for trans in details.transactions:
+            if trans.is_derivative or trans.amount <= 0:
+                continue
+            if trans.code in CLUSTER_BUY_CODES:
+                self.push((day, details.ticker, owner.cik or owner.name, owner.name, trans.amount, 0.0))
+            elif trans.code in CLUSTER_SELL_CODES:
+                self.push((day, details.ticker, owner.cik or owner.name, owner.name, 0.0, trans.amount))
+        
+        if self.newest is None or day > self.newest:
+            self.newest = day
+        self.expire()
+        
+        alert = self.check(details.ticker, details.issuer_name)
+        return [alert] if alert else []
+
+    def push(self, event):
+        _, ticker, owner, name, buy_value, sell_value = event
+        self.events.append(event)
+        agg = self.tickers.setdefault(ticker, {'events': 0, 'buy_value': 0.0, 'sell_value': 0.0,
+                                               'buyers': {}, 'names': {}})
+        agg['events'] += 1
+        agg['buy_value'] += buy_value
+        agg['sell_value'] += sell_value
+        if buy_value:
+            agg['buyers'][owner] = agg['buyers'].get(owner, 0) + 1
+            agg['names'][owner] = name
+
+    def expire(self):
+        """Drop events and filings that have left the window
+        
+        Filings arrive close to day order; a late one for an older day just
+        stays until the events queued ahead of it expire.
+        """
+        cutoff = self.newest - self.window
+        while self.events and self.events[0][0] <= cutoff:
+            _, ticker, owner, _, buy_value, sell_value = self.events.popleft()
+            agg = self.tickers[ticker]
+            agg['events'] -= 1
+            agg['buy_value'] -= buy_value
+            agg['sell_value'] -= sell_value
+            if buy_value:
+                agg['buyers'][owner] -= 1
+                if not agg['buyers'][owner]:
+                    del agg['buyers'][owner]
+                    del agg['names'][owner]
+            if not agg['events']:
+                del self.tickers[ticker]
+                self.alerted.pop(ticker, None)
+        while self.arrivals and self.arrivals[0][0] <= cutoff:
+            self.accessions.discard(self.arrivals.popleft()[1])
+
+    def check(self, ticker, issuer_name):
+        """Alert details when a ticker's window crosses the thresholds, once per window"""
+        agg = self.tickers.get(ticker)
+        if not agg or self.alerted.get(ticker, date.min) > self.newest - self.window:
+            return None
+        buyers = len(agg['buyers'])
+        net_flow = agg['buy_value'] - agg['sell_value']
+        ratio = agg['buy_value'] / agg['sell_value'] if agg['sell_value'] > 0 else float('inf')
+        if buyers < CLUSTER_MIN_BUYERS or net_flow < CLUSTER_MIN_NET_FLOW or ratio < CLUSTER_MIN_BUY_SELL_RATIO:
+            return None
+        
+        self.alerted[ticker] = self.newest
+        return {
+            'ticker': ticker,
+            'issuer_name': issuer_name,
+            'buyers': sorted(agg['names'].values()),
+            'buy_value': agg['buy_value'],
+            'sell_value': agg['sell_value'],
+            'net_flow': net_flow,
+            'ratio': ratio,
+            'window_end': self.newest.isoformat()
+        }
+    
+    @staticmethod
+    def key(cluster):
+        """Delivery key of a cluster alert; filing alerts use their accession number"""
+        return f"cluster:{cluster['ticker']}:{cluster['window_end']}"
+    
+    def sent(self, cluster, attempts=0):
+        """Track a cluster alert handed to the delivery; returns its key"""
+        key = self.key(cluster)
+        self.sending[key] = (cluster, attempts)
+        return key
+    
+    def settled(self, key, failed_destinations):
+        """Record a cluster alert's outcome: 'notified', 'retry' or 'dead'"""
+        cluster, attempts = self.sending.pop(key, (None, 0))
+        if not failed_destinations or cluster is None:
+            return 'notified'
+        status, delay = retry_backoff(attempts + 1)
+        if status == 'retry':
+            self.retries[key] = {'cluster': cluster, 'destinations': sorted(failed_destinations),
+                                 'attempts': attempts + 1, 'next_attempt': time.time() + delay}
+        return status
+    
+    def due_retries(self):
+        """Take the failed cluster alerts whose backoff has expired"""
+        now = time.time()
+        due = [key for key, retry in self.retries.items() if retry['next_attempt'] <= now]
+        return [self.retries.pop(key) for key in due]
+
+    def to_dict(self):
+        """Window contents for the filing store; aggregates are rebuilt on load"""
+        return {
+            'events': [[day.isoformat(), *rest] for day, *rest in self.events],
+            'arrivals': [[day.isoformat(), accession] for day, accession in self.arrivals],
+            'alerted': {t: day.isoformat() for t, day in self.alerted.items()},
+            'retries': list(self.retries.values())
+        }
+
+    def load(self, data):
+        """Replace the window with one saved by to_dict()"""
+        self.__init__(self.window.days)
+        for day, *rest in data.get('events', []):
+            self.push((date.fromisoformat(day), *rest))
+        for day, accession in data.get('arrivals', []):
+            self.arrivals.append((date.fromisoformat(day), accession))
+            self.accessions.add(accession)
+        self.alerted = {t: date.fromisoformat(d) for t, d in data.get('alerted', {}).items()}
+        self.retries = {self.key(retry['cluster']): retry for retry in data.get('retries', [])}
+        if self.arrivals:
+            self.newest = max(day for day, _ in self.arrivals)
+
+
+class AlertRule:
+    """One rule from ALERT_RULES_FILE, compiled into staged predicates
+    
+    The entry stage only needs the issuer CIK from the feed entry, so it runs
+    before anything is fetched. The document stage runs after parsing, with
+    its checks ordered cheapest first: issuer, owner role, then a scan of the
+    transactions.
+    """
+
+    KEYS = ('name', 'tickers', 'ciks', 'codes', 'min_value', 'roles', 'derivative')
+
+    def __init__(self, spec, company_tickers):
+        unknown = sorted(set(spec) - set(self.KEYS))
+        self.name = spec.get('name', 'rule')
+        self.spec = spec
+        if unknown:
+            raise ValueError(f"Rule '{self.name}' has unknown key(s): {', '.join(unknown)}")
+        roles = [role for role in spec.get('roles', []) if role not in RULE_ROLES]
+        if roles:
+            raise ValueError(f"Rule '{self.name}' has unknown role(s): {', '.join(roles)}")
+        
+        self.tickers = {normalize_ticker(t) for t in spec.get('tickers', [])}
+        ciks = {int(cik) for cik in spec.get('ciks', [])}
+        self.restricted = bool(self.tickers or ciks)
+        self.entry_rejected = 0
+        self.document_rejected = 0
+        self.hits = 0
+        
+        # Issuer CIKs that can be matched against feed entries, or None when
+        # a ticker can't be mapped and only the XML can tell
+        self.issuer_ciks = None
+        if self.restricted:
+            missing = sorted(t for t in self.tickers if t not in company_tickers)
+            if missing:
+                print(f"⚠ Rule '{self.name}': no CIK known for {', '.join(missing)} - checking every filing's XML")
+            else:
+                self.issuer_ciks = ciks | {company_tickers[t] for t in self.tickers}
+        
+        self.document_checks = []
+        if self.restricted:
+            self.document_checks.append(self.issuer_check(self.tickers, ciks | (self.issuer_ciks or set())))
+        if spec.get('roles'):
+            self.document_checks.append(self.role_check([RULE_ROLES[role] for role in spec['roles']]))
+        if 'codes' in spec or 'derivative' in spec or spec.get('min_value'):
+            self.document_checks.append(self.transaction_check(
+                set(spec['codes']) if 'codes' in spec else None, spec.get('derivative'), spec.get('min_value', 0)))
+
+    @staticmethod
+    def issuer_check(tickers, ciks):
+        def check(details):
+            return normalize_ticker(details.ticker) in tickers or issuer_cik_number(details.cik) in ciks
+        return check
+
+    @staticmethod
+    def role_check(flags):
+        def check(details):
+            return details.owner is not None and any(getattr(details.owner, flag) for flag in flags)
+        return check
+
+    @staticmethod
+    def transaction_check(codes, derivative, min_value):
+        def check(details):
+            matched = False
+            value = 0.0
+            for trans in details.transactions:
+                if codes is not None and trans.code not in codes:
+                    continue
+                if derivative is not None and trans.is_derivative != derivative:
+                    continue
+                matched = True
+                value += trans.amount
+            return matched and value >= min_value
+        return check
+
+    def could_match(self, filing):
+        """Stage 1: can this rule still match, judging by the feed entry alone?"""
+        cik = filing.get('issuer_cik')
+        return self.issuer_ciks is None or cik is None or cik in self.issuer_ciks
+
+    def accepts_entry(self, filing):
+        """Stage 1, counted in the rule's stats"""
+        if self.could_match(filing):
+            return True
+        self.entry_rejected += 1
+        return False
+
+    def accepts_document(self, details):
+        """Stage 2: does the parsed filing satisfy every check?"""
+        for check in self.document_checks:
+            if not check(details):
+                self.document_rejected += 1
+                return False
+        self.hits += 1
+        return True
+
+
+class AlertRules:
+    """The active rule set; a filing alerts when any rule matches
+    
+    An empty rule set matches everything, like an empty ticker watchlist.
+    """
+
+    def __init__(self, specs, scope=None, watchlist=None):
+        self.watchlist = watchlist
+        self.source = None  # (path, mtime) the rules were loaded from; see reload_alert_rules()
+        company_tickers = load_company_tickers() if any(s.get('tickers') for s in specs) else {}
+        self.rules = [AlertRule({'name': f"rule-{i}", **spec}, company_tickers) for i, spec in enumerate(specs, 1)]
+        self.scope = scope or ('all' if not specs else
+                               'rules:' + hashlib.sha1(json.dumps(specs, sort_keys=True).encode()).hexdigest()[:12])
+
+    def __bool__(self):
+        return bool(self.rules)
+    
+    def carry_counters(self, previous):
+        """Continue the hit and rejection counts of same-named rules from an earlier load"""
+        counted = {rule.name: rule for rule in previous.rules}
+        for rule in self.rules:
+            old = counted.get(rule.name)
+            if old:
+                rule.hits += old.hits
+                rule.entry_rejected += old.entry_rejected
+                rule.document_rejected += old.document_rejected
+
+    def unrestricted(self):
+        """True when some filing for any issuer could match"""
+        return not self.rules or any(not rule.restricted for rule in self.rules)
+
+    def issuer_ciks(self):
+        """Every issuer CIK the rules can match, or None if that isn't known up front"""
+        if self.unrestricted() or any(rule.issuer_ciks is None for rule in self.rules):
+            return None
+        return set().union(*(rule.issuer_ciks for rule in self.rules))
+
+    def prefilter(self, filings):
+        """Split filings into (candidates, rejected) using only their feed entries"""
+        if not self.rules:
+            return filings, []
+        candidates = []
+        rejected = []
+        for filing in filings:
+            # No short-circuit, so every rule's entry stage is counted
+            if [rule for rule in self.rules if rule.accepts_entry(filing)]:
+                candidates.append(filing)
+            else:
+                rejected.append(filing)
+        return candidates, rejected
+
+    def match(self, filing, details):
+        """Names of the rules a parsed filing matches"""
+        if not self.rules:
+            return ['all']
+        if not details:
+            return []
+        return [rule.name for rule in self.rules if rule.could_match(filing) and rule.accepts_document(details)]
+
+    def watches_issuer(self, details):
+        """True when the rules cover this issuer at all, whatever else they require"""
+        if self.unrestricted():
+            return True
+        ticker = normalize_ticker(details.ticker)
+        cik = issuer_cik_number(details.cik)
+        return any(ticker in rule.tickers or cik in (rule.issuer_ciks or ()) for rule in self.rules)
+
+    @classmethod
+    def from_watchlist(cls, filters):
+        """The ticker watchlist as a rule set: one rule matching any of its tickers"""
+        if not filters:
+            return cls([], watchlist=set())
+        return cls([{'name': 'watchlist', 'tickers': sorted(filters)}], scope=','.join(sorted(filters)),
+                   watchlist=set(filters))
+
+
+SEC_RATE_LIMITER = RateLimiter(SEC_MAX_REQUESTS_PER_SECOND)
+HTTP = HttpTransport()
+FILING_CACHE = FilingCache()
+CLUSTER_DETECTOR = ClusterDetector()
+METRICS = Metrics()
+PARSE_PROFILER = cProfile.Profile() if PROFILE_PARSE_FILE else None
+PARSE_PROFILER_LOCK = threading.Lock()
+
+# Elements parse_form4_document streams out of a Form 4 document
+FORM4_SECTIONS = ('issuer', 'reportingOwner', 'nonDerivativeTransaction', 'derivativeTransaction', 'footnote')
+
+TRANSACTION_TYPES = {
+    'P': 'Purchase',
+    'S': 'Sale',
+    'A': 'Grant/Award',
+    'D': 'Disposition',
+    'F': 'Payment',
+    'M': 'Exercise',
+    'G': 'Gift',
+    'J': 'Other',
+    'K': 'Transaction in Equity Swap'
+}
+# Codes shown as acquisitions (green) and dispositions (red)
+BUY_CODES = frozenset('PAMX')
+SELL_CODES = frozenset('SDF')
+
+# Column types for Parquet/Arrow exports, in TransactionExporter.COLUMNS order
+EXPORT_SCHEMA = pa.schema([
+    ('accession', pa.string()), ('issuer_cik', pa.string()), ('ticker', pa.string()),
+    ('issuer_name', pa.string()), ('owner_cik', pa.string()), ('owner_name', pa.string()),
+    ('owner_role', pa.string()), ('code', pa.string()), ('type', pa.string()), ('security', pa.string()),
+    ('is_derivative', pa.bool_()), ('shares', pa.float64()), ('price', pa.float64()),
+    ('amount', pa.float64()), ('transaction_date', pa.string()), ('filing_date', pa.string())
+]) if pa else None
+
+# Owner roles a rule can ask for -> ReportingOwner flag
+RULE_ROLES = {
+    'director': 'is_director',
+    'officer': 'is_officer',
+    'ten_percent_owner': 'is_ten_percent_owner'
+}
+
+# Pipeline statuses that mean a filing is finished with
+TERMINAL_STATUSES = ('notified', 'skipped', 'seen', 'failed', 'dead')
+# ...plus filings whose alert is sitting in the delivery queue
+INACTIVE_STATUSES = TERMINAL_STATUSES + ('notifying',)
+# Finished filings nobody will look at again: their feed title and summary are dropped
+TRIMMED_STATUSES = ('notified', 'skipped', 'seen')
+# ...and the ones that were never alerted on, kept only for SEEN_RETENTION_DAYS
+UNALERTED_STATUSES = ('skipped', 'seen')
+
+# Feed entry titles look like "4 - NVIDIA CORP (0001045810) (Issuer)"
+FEED_TITLE_PATTERN = re.compile(r'^.+? - (?P<name>.*) \((?P<cik>\d{10})\) \((?P<role>[^)]+)\)$')
+
+ACCESSION_PATTERN = re.compile(r'/(\d{10}-\d{2}-\d{6})-index\.html?$')
+FILING_CIK_PATTERN = re.compile(r'/data/(\d+)/')
+
+# accession number -> primary XML document URL, persisted in the filing store
+XML_URL_CACHE = {}
+
+# ticker -> issuer CIK, loaded from COMPANY_TICKERS_FILE
+COMPANY_TICKERS = {}
+
+def sec_get(url, accept, timeout=15, conditional=False):
+    """GET a sec.gov URL once the shared rate limiter allows it"""
+    # Timed on its own, since it also counts towards the calling stage
+    with METRICS.timed('rate_limit_wait'):
+        SEC_RATE_LIMITER.acquire()
+    headers = {'Accept': accept}
+    if conditional:
+        return HTTP.conditional_get(url, headers=headers, timeout=timeout)
+    return HTTP.get(url, headers=headers, timeout=timeout)
+
+def migrate_json_state(store):
+    """Import the JSON state files used before the SQLite store, then remove them"""
+    if os.path.exists(LEGACY_STATE_FILE):
+        with open(LEGACY_STATE_FILE, 'r') as f:
+            data = json.load(f)
+        
+        if isinstance(data, list):
+            # Oldest format was just the last feed page (newest first)
+            data = {'seen': [f.get('filing_url') for f in data],
+                    'watermark': {'updated': data[0].get('filing_date')} if data else None,
+                    'backlog': []}
+        
+        seen = []
+        for item in data.get('seen', []):
+            accession = accession_from_url(item) or item
+            seen.append({'accession': accession, 'filing_url': item if item != accession else ''})
+        store.enqueue(seen, status='seen')
+        store.enqueue(data.get('backlog', []))
+        if data.get('watermark') and store.get_meta('watermark') is None:
+            store.set_meta('watermark', data['watermark'])
+        os.remove(LEGACY_STATE_FILE)
+        print(f"✓ Migrated {LEGACY_STATE_FILE} into {STATE_DB}")
+    
+    # Cached XML URLs only ever pointed at filings that are now marked seen
+    if os.path.exists(LEGACY_XML_URL_CACHE_FILE):
+        os.remove(LEGACY_XML_URL_CACHE_FILE)
+    
+    if os.path.exists(LEGACY_HTTP_VALIDATORS_FILE):
+        with open(LEGACY_HTTP_VALIDATORS_FILE, 'r') as f:
+            store.set_meta('http_validators', json.load(f))
+        os.remove(LEGACY_HTTP_VALIDATORS_FILE)
 
 def load_ticker_filters():
     """Load ticker filters from file"""
@@ -59,6 +2095,126 @@ def clear_ticker_filters():
     save_ticker_filters(set())
     return set()
 
+def normalize_ticker(ticker):
+    """SEC writes share classes as BRK-B; accept BRK.B too"""
+    return ticker.upper().replace('.', '-')
+
+def refresh_company_tickers():
+    """Download SEC's ticker -> CIK snapshot and save a compact local copy
+    
+    The copy records when it was fetched; the file's mtime can't be trusted
+    since a fresh checkout resets it.
+    """
+    response = sec_get(COMPANY_TICKERS_URL, INDEX_JSON_ACCEPT)
+    response.raise_for_status()
+    
+    tickers = {normalize_ticker(row['ticker']): int(row['cik_str']) for row in response.json().values()}
+    with open(COMPANY_TICKERS_FILE, 'w') as f:
+        json.dump({'fetched_at': time.time(), 'tickers': tickers}, f, separators=(',', ':'), sort_keys=True)
+    
+    COMPANY_TICKERS.clear()
+    COMPANY_TICKERS.update(tickers)
+    print(f"✓ Refreshed {len(tickers)} ticker -> CIK mappings")
+    return COMPANY_TICKERS
+
+def load_company_tickers():
+    """Ticker -> issuer CIK map, refreshed when the local snapshot is stale"""
+    snapshot = {}
+    if os.path.exists(COMPANY_TICKERS_FILE):
+        with open(COMPANY_TICKERS_FILE, 'r') as f:
+            snapshot = json.load(f)
+        if 'tickers' not in snapshot:  # Copies saved before fetched_at was recorded
+            snapshot = {'fetched_at': 0, 'tickers': snapshot}
+    
+    if not snapshot or time.time() - snapshot['fetched_at'] > COMPANY_TICKERS_MAX_AGE_DAYS * 86400:
+        try:
+            return refresh_company_tickers()
+        except Exception as e:
+            print(f"⚠ Could not refresh {COMPANY_TICKERS_FILE}: {e}")
+    
+    if not COMPANY_TICKERS and snapshot:
+        COMPANY_TICKERS.update(snapshot['tickers'])
+    return COMPANY_TICKERS
+
+def issuer_cik_number(cik):
+    """Issuer CIK from a parsed filing as an int, or None when it is missing"""
+    try:
+        return int(cik)
+    except (TypeError, ValueError):
+        return None
+
+def load_alert_router():
+    """Start a sender per destination in ALERT_ROUTES_FILE, or just DISCORD_WEBHOOK
+    
+    The routes file looks like:
+    
+        {"destinations": {"semis": {"url": "https://discord.com/api/webhooks/..."},
+                          "internal": {"type": "webhook", "url_env": "INTERNAL_ALERTS_URL",
+                                       "headers": {"Authorization": "Bearer ..."}},
+                          "discord": {"url": "https://discord.com/api/webhooks/..."}},
+         "routes": [{"tickers": ["NVDA", "AMD"], "to": ["semis"]},
+                    {"rules": ["large-buys"], "severities": ["cluster"], "to": ["internal"]}],
+         "default": ["discord"]}
+    
+    Severities are 'filing', 'cluster' and 'info'. An alert goes to the union
+    of the routes it matches, or to the defaults when it matches none.
+    """
+    if not os.path.exists(ALERT_ROUTES_FILE):
+        return AlertRouter({'discord': {'url': DISCORD_WEBHOOK}})
+    
+    with open(ALERT_ROUTES_FILE, 'r') as f:
+        config = json.load(f)
+    return AlertRouter(config['destinations'], config.get('routes', []), config.get('default', ['discord']))
+
+def load_alert_rules():
+    """Compile ALERT_RULES_FILE, or the ticker watchlist when there is no rule file
+    
+    A filing alerts when any rule matches; every key in a rule is optional:
+    
+        {"rules": [{"name": "nvda-buys", "tickers": ["NVDA"], "ciks": [1045810],
+                    "codes": ["P"], "min_value": 100000, "roles": ["director", "officer"],
+                    "derivative": false}]}
+    
+    min_value is the combined value of the transactions passing codes and
+    derivative; roles accepts director, officer and ten_percent_owner.
+    Raises ValueError for a rule file that doesn't parse or has unknown keys.
+    """
+    source = alert_rules_source()
+    if not os.path.exists(ALERT_RULES_FILE):
+        rules = AlertRules.from_watchlist(load_ticker_filters())
+    else:
+        try:
+            with open(ALERT_RULES_FILE, 'r') as f:
+                specs = json.load(f).get('rules', [])
+        except json.JSONDecodeError as e:
+            raise ValueError(f"{ALERT_RULES_FILE} is not valid JSON: {e}")
+        rules = AlertRules(specs)
+    rules.source = source
+    return rules
+
+def alert_rules_source():
+    """(path, mtime) of the file the rules come from: ALERT_RULES_FILE, else FILTERS_FILE"""
+    path = ALERT_RULES_FILE if os.path.exists(ALERT_RULES_FILE) else FILTERS_FILE
+    try:
+        return path, os.path.getmtime(path)
+    except OSError:
+        return path, None
+
+def reload_alert_rules(rules):
+    """The long-running loops' rules: `rules` itself until its file changes, then a fresh load
+    
+    Hit and rejection counts carry over to rules of the same name. Raises
+    ValueError like load_alert_rules(), once per broken edit.
+    """
+    source = alert_rules_source()
+    if source == rules.source:
+        return rules
+    rules.source = source  # A broken edit is reported once, not on every poll
+    reloaded = load_alert_rules()
+    reloaded.carry_counters(rules)
+    print_filters(reloaded)
+    return reloaded
+
 def send_filters_notification():
     """Send a notification showing active filters"""
     filters = load_ticker_filters()
@@ -70,6 +2226,8 @@ def send_filters_notification():
     else:
         description = "No ticker filters active. Monitoring **all** Form 4 filings."
         color = 10197915  # Gray
+    if os.path.exists(ALERT_RULES_FILE):
+        description += f"\n\n⚠ {ALERT_RULES_FILE} is present and is used instead of this list."
     
     embed = {
         "title": "📋 Active Ticker Filters",
@@ -79,12 +2237,14 @@ def send_filters_notification():
         "timestamp": datetime.utcnow().isoformat()
     }
     
-    try:
-        response = requests.post(DISCORD_WEBHOOK, json={"embeds": [embed]}, timeout=10)
-        response.raise_for_status()
+    delivery = load_alert_router()
+    delivery.submit(embed, severity='info')
+    delivery.close()
+    
+    if not any(failed for _, failed in delivery.completed()):
         print("✓ Filters notification sent")
-    except Exception as e:
-        print(f"✗ Error sending filters notification: {e}")
+    else:
+        print("✗ Error sending filters notification")
 
 def get_text(element, default=''):
     """Safely extract text from XML element"""
@@ -93,74 +2253,292 @@ def get_text(element, default=''):
     text = element.get_text(strip=True)
     return text if text else default
 
-def fetch_latest_form4_filings():
-    """Fetch the latest Form 4 filings from SEC EDGAR using the official RSS feed
+def feed_page_url(start):
+    """URL of one page of the official getcurrent Form 4 atom feed"""
+    return (f"{SEC_DAILY_INDEX_BASE}?action=getcurrent&type=4&company=&dateb=&owner=include"
+            f"&start={start}&count={FEED_PAGE_SIZE}&output=atom")
+
+def parse_feed_time(value):
+    """Parse an atom <updated> timestamp, or None if it is malformed"""
+    try:
+        return datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+
+def fetch_feed_page(start, conditional=False):
+    """Fetch one page of feed entries, newest first; None if unchanged (304)"""
+    response = sec_get(feed_page_url(start), FEED_ACCEPT, conditional=conditional)
+    if response.status_code == 304:
+        return None
+    response.raise_for_status()
+    
+    soup = BeautifulSoup(response.content, 'xml')
+    filings = []
+    
+    for entry in soup.find_all('entry'):
+        # Extract filing information
+        title = get_text(entry.find('title'))
+        
+        # Get the filing link
+        link = entry.find('link')
+        filing_url = link.get('href') if link else None
+        
+        # Get the filing date/time
+        updated = get_text(entry.find('updated'))
+        
+        # Get the summary which contains additional details
+        summary = get_text(entry.find('summary'))
+        
+        # The issuer's own entry carries its CIK in the title
+        match = FEED_TITLE_PATTERN.match(title)
+        issuer_cik = int(match.group('cik')) if match and match.group('role') == 'Issuer' else None
+        
+        if filing_url:
+            filings.append({
+                'accession': accession_from_url(filing_url),
+                'title': title,
+                'filing_url': filing_url,
+                'filing_date': updated,
+                'summary': summary,
+                'issuer_cik': issuer_cik
+            })
+    
+    return filings
+
+def fetch_new_form4_filings(watermark, seen):
+    """Page back through the Form 4 feed until reaching the last-seen watermark
     
     Note: We fetch all filings because ticker symbols are not always in the title.
     Filtering happens after XML parsing where ticker is guaranteed to be present.
-    """
-    headers = {
-        'User-Agent': 'Discord Bot sec-form4-tracker/1.0 (contact@example.com)',
-        'Accept': 'application/atom+xml,application/xml,text/xml,*/*',
-        'Accept-Encoding': 'gzip, deflate'
-    }
     
-    # This RSS feed is the official SEC source for latest Form 4 filings
-    rss_url = f"{SEC_DAILY_INDEX_BASE}?action=getcurrent&type=4&company=&dateb=&owner=include&start=0&count=100&output=atom"
+    The feed lists each filing once per party (issuer and reporting owner), so
+    entries are merged by accession number. Returns unseen filings oldest first,
+    or None when the feed is unchanged since the last poll.
+    """
+    watermark_time = parse_feed_time(watermark.get('updated')) if watermark else None
+    new_filings = {}
     
     try:
         print("Fetching latest Form 4 filings from SEC EDGAR...")
         
-        response = requests.get(rss_url, headers=headers, timeout=15)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'xml')
-        entries = soup.find_all('entry')
-        
-        filings = []
-        
-        for entry in entries:
-            # Extract filing information
-            title = get_text(entry.find('title'))
-            
-            # Get the filing link
-            link = entry.find('link')
-            filing_url = link.get('href') if link else None
+        for page in range(MAX_FEED_PAGES):
+            with METRICS.timed('feed'):
+                entries = fetch_feed_page(page * FEED_PAGE_SIZE, conditional=(page == 0))
+            if entries is None:
+                print("  Feed unchanged since last check (304)")
+                return None
             
-            # Get the filing date/time
-            updated = get_text(entry.find('updated'))
-            
-            # Get the summary which contains additional details
-            summary = get_text(entry.find('summary'))
+            reached_watermark = False
+            for entry in entries:
+                accession = entry['accession'] or entry['filing_url']
+                entry_time = parse_feed_time(entry['filing_date'])
+                
+                if accession in seen or (watermark_time and entry_time and entry_time < watermark_time):
+                    reached_watermark = True
+                    continue
+                
+                # Prefer the issuer entry so the title names the company
+                if accession not in new_filings or entry['issuer_cik'] is not None:
+                    new_filings[accession] = dict(entry, accession=accession)
             
-            if filing_url:
-                filings.append({
-                    'title': title,
-                    'filing_url': filing_url,
-                    'filing_date': updated,
-                    'summary': summary
-                })
+            # First run has no watermark: one page is enough to get started
+            if reached_watermark or not watermark or len(entries) < FEED_PAGE_SIZE:
+                break
+        else:
+            print(f"  ⚠ Stopped after {MAX_FEED_PAGES} pages without reaching the watermark")
         
-        print(f"  Found {len(filings)} Form 4 filings")
-        return filings[:50]  # Return top 50 most recent filings
+        print(f"  Found {len(new_filings)} unseen Form 4 filing(s) across {page + 1} page(s)")
+        return list(reversed(new_filings.values()))
         
     except Exception as e:
         print(f"Error fetching filings: {e}")
         import traceback
         traceback.print_exc()
+        # Page one's validators would turn the retry into a 304 and hide these filings
+        HTTP.validators.pop(feed_page_url(0), None)
+        return []
+
+def submissions_url(cik):
+    return f"{SEC_SUBMISSIONS_BASE}/CIK{cik:010d}.json"
+
+def archive_folder_url(cik, accession):
+    return f"{SEC_ARCHIVES_BASE}/{cik}/{accession.replace('-', '')}"
+
+def parse_submissions(data, cik, since):
+    """Form 4 filings accepted after `since` from a submissions JSON document
+    
+    Returns (filings oldest first, newest acceptance time, filings in the last
+    30 days). The primary document is known up front, so each record already
+    carries its XML URL.
+    """
+    recent = data.get('filings', {}).get('recent', {})
+    name = data.get('name', f"CIK {cik}")
+    since_time = parse_feed_time(since) if since else None
+    month_ago = datetime.now(EASTERN) - timedelta(days=30)
+    
+    filings = []
+    newest = since
+    activity = 0
+    
+    rows = zip(recent.get('accessionNumber', []), recent.get('form', []),
+               recent.get('acceptanceDateTime', []), recent.get('filingDate', []),
+               recent.get('primaryDocument', []))
+    for accession, form, accepted, filed, document in rows:
+        if form not in SUBMISSIONS_FORMS:
+            continue
+        
+        accepted_time = parse_feed_time(accepted)
+        if accepted_time and accepted_time >= month_ago:
+            activity += 1
+        if newest is None or (accepted_time and accepted_time > parse_feed_time(newest)):
+            newest = accepted
+        if since_time is None or accepted_time is None or accepted_time <= since_time:
+            continue
+        
+        folder_url = archive_folder_url(cik, accession)
+        # primaryDocument points at the XSL rendering, e.g. xslF345X05/form4.xml
+        xml_name = document.rsplit('/', 1)[-1]
+        filings.append({
+            'accession': accession,
+            'title': f"{form} - {name} ({cik:010d}) (Issuer)",
+            'filing_url': f"{folder_url}/{accession}-index.htm",
+            'filing_date': accepted,
+            'summary': f"Filed: {filed} AccNo: {accession}",
+            'issuer_cik': cik,
+            'xml_url': f"{folder_url}/{xml_name}" if xml_name.lower().endswith('.xml') else None
+        })
+    
+    # The submissions API lists newest first
+    filings.sort(key=lambda f: f['filing_date'])
+    return filings, newest, activity
+
+def submissions_poll_interval(activity):
+    """Seconds until an issuer's next poll; busier issuers are polled sooner"""
+    return min(max(SUBMISSIONS_MAX_INTERVAL / (1 + activity), SUBMISSIONS_MIN_INTERVAL),
+               SUBMISSIONS_MAX_INTERVAL)
+
+def fetch_submissions_filings(store, rules):
+    """Poll data.sec.gov submissions for the watched issuers that are due
+    
+    Each cycle polls at most SUBMISSIONS_POLLS_PER_CYCLE issuers, the most
+    overdue first, with conditional GETs so unchanged issuers cost a 304. An
+    issuer's first poll only records its newest filing as the starting point.
+    """
+    watched = rules.issuer_ciks()
+    if not watched:
+        print("⚠ Submissions mode needs ticker filters or rules with known CIKs - nothing to poll")
         return []
+    
+    schedule = store.get_meta('submissions_schedule', {})
+    now = time.time()
+    due = sorted((schedule.get(str(cik), {}).get('next_poll', 0), cik) for cik in watched)
+    due = [cik for next_poll, cik in due if next_poll <= now][:SUBMISSIONS_POLLS_PER_CYCLE]
+    
+    print(f"Polling submissions for {len(due)} of {len(watched)} watched issuer(s)...")
+    new_filings = []
+    unchanged = 0
+    
+    for cik in due:
+        entry = schedule.setdefault(str(cik), {'next_poll': 0, 'activity': 0, 'newest': None})
+        try:
+            with METRICS.timed('feed'):
+                response = sec_get(submissions_url(cik), INDEX_JSON_ACCEPT, conditional=True)
+            if response.status_code == 304:
+                unchanged += 1
+            else:
+                response.raise_for_status()
+                filings, newest, activity = parse_submissions(response.json(), cik, entry['newest'])
+                if entry['newest'] is not None:
+                    new_filings.extend(filings)
+                entry['newest'] = newest
+                entry['activity'] = activity
+        except Exception as e:
+            print(f"  Error polling CIK {cik}: {e}")
+            HTTP.validators.pop(submissions_url(cik), None)
+        
+        entry['next_poll'] = time.time() + submissions_poll_interval(entry['activity'])
+    
+    store.set_meta('submissions_schedule', schedule)
+    new_filings.sort(key=lambda f: parse_feed_time(f['filing_date']) or datetime.now(EASTERN))
+    print(f"  Found {len(new_filings)} new Form 4 filing(s), {unchanged} issuer(s) unchanged")
+    return new_filings
+
+def retry_backoff(attempts):
+    """(status, delay in seconds) after a failed attempt: 'retry' with a backoff, or 'dead'"""
+    if attempts >= RETRY_MAX_ATTEMPTS:
+        return 'dead', 0.0
+    # Full doubling with +/-50% jitter, so failures from one outage don't retry in lockstep
+    return 'retry', min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY) * random.uniform(0.5, 1.5)
+
+def transient_error(error):
+    """True for failures worth retrying later: timeouts, dropped connections, 429s and 5xx"""
+    if isinstance(error, (requests.Timeout, requests.ConnectionError)):
+        return True
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        return error.response.status_code == 429 or error.response.status_code >= 500
+    return False
+
+def accession_from_url(filing_url):
+    """Extract the accession number from a filing index URL"""
+    match = ACCESSION_PATTERN.search(filing_url or '')
+    return match.group(1) if match else None
+
+def filing_cik(filing):
+    """Issuer CIK of a queued filing, else the CIK in its index URL (0 if neither)"""
+    cik = issuer_cik_number(filing.get('issuer_cik'))
+    if cik is None:
+        match = FILING_CIK_PATTERN.search(filing.get('filing_url') or '')
+        cik = int(match.group(1)) if match else 0
+    return cik
+
+def filed_day(filing):
+    """A filing's filing date as YYYY-MM-DD, from the feed's timestamp or an index's date"""
+    value = filing.get('filed') or filing.get('filing_date') or ''
+    if len(value) == 8 and value.isdigit():  # Daily indexes write 20250602
+        return f"{value[:4]}-{value[4:6]}-{value[6:]}"
+    return value[:10]
 
 def get_filing_xml_url(filing_url):
-    """Extract the XML document URL from a filing page"""
-    headers = {
-        'User-Agent': 'Discord Bot sec-form4-tracker/1.0 (contact@example.com)',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8'
-    }
+    """Find the Form 4 XML document URL for a filing
     
+    Tries the cache, then the filing's index.json directory listing, and only
+    scrapes the HTML index page if both of those come up empty.
+    """
+    accession = accession_from_url(filing_url)
+    if accession and accession in XML_URL_CACHE:
+        return XML_URL_CACHE[accession]
+    
+    with METRICS.timed('resolve'):
+        xml_url = resolve_xml_url_from_index_json(filing_url) or scrape_filing_xml_url(filing_url)
+    
+    if xml_url and accession:
+        XML_URL_CACHE[accession] = xml_url
+    return xml_url
+
+def resolve_xml_url_from_index_json(filing_url):
+    """Find the primary XML document from the filing's index.json listing"""
+    folder_url = filing_url.rsplit('/', 1)[0]
+    
+    try:
+        response = sec_get(f"{folder_url}/index.json", INDEX_JSON_ACCEPT)
+        response.raise_for_status()
+        
+        for item in response.json().get('directory', {}).get('item', []):
+            name = item.get('name', '')
+            if name.lower().endswith('.xml'):
+                return f"{folder_url}/{name}"
+        
+        return None
+        
+    except Exception as e:
+        print(f"  index.json lookup failed, falling back to index page: {e}")
+        return None
+
+def scrape_filing_xml_url(filing_url):
+    """Extract the XML document URL by scraping the filing index page"""
     try:
-        response = requests.get(filing_url, headers=headers, timeout=15)
+        response = sec_get(filing_url, INDEX_PAGE_ACCEPT)
         response.raise_for_status()
-        time.sleep(0.15)  # Respect SEC rate limits (10 req/sec = 100ms, we use 150ms to be safe)
         
         soup = BeautifulSoup(response.content, 'html.parser')
         
@@ -174,143 +2552,206 @@ def get_filing_xml_url(filing_url):
                         href = doc_link.get('href', '')
                         # Look for .xml but not .xsl
                         if '.xml' in href and 'xsl' not in href.lower():
-                            return 'https://www.sec.gov' + href
+                            return urljoin(filing_url, href)
         
         return None
         
     except Exception as e:
+        if transient_error(e):
+            raise
         print(f"  Error getting XML URL: {e}")
         return None
 
-def parse_form4_xml(xml_url):
-    """Parse Form 4 XML and extract transaction details"""
-    headers = {
-        'User-Agent': 'Discord Bot sec-form4-tracker/1.0 (contact@example.com)',
-        'Accept': 'application/xml,text/xml,*/*'
-    }
+def parse_form4_xml(xml_url, accession=None):
+    """Parse Form 4 XML and extract transaction details
     
+    With an accession number, parsed details and raw XML come from the filing
+    cache when present, and anything downloaded or parsed is added to it.
+    """
     try:
-        print(f"  Parsing XML: {xml_url.split('/')[-1]}")
-        response = requests.get(xml_url, headers=headers, timeout=15)
-        response.raise_for_status()
-        time.sleep(0.15)  # Respect SEC rate limits
-        
-        soup = BeautifulSoup(response.content, 'xml')
-        
-        details = {}
+        details = FILING_CACHE.get_parsed(accession)
+        if details is None:
+            content = FILING_CACHE.get_raw(accession)
+            if content is None:
+                print(f"  Parsing XML: {xml_url.split('/')[-1]}")
+                with METRICS.timed('download'):
+                    response = sec_get(xml_url, XML_ACCEPT)
+                    response.raise_for_status()
+                    content = response.content
+                FILING_CACHE.put_raw(accession, content)
+            
+            with METRICS.timed('parse'):
+                details = profiled_parse(content)
+            FILING_CACHE.put_parsed(accession, details)
         
-        # Issuer information
-        issuer = soup.find('issuer')
-        if issuer:
-            details['issuer_name'] = get_text(issuer.find('issuerName'), 'N/A')
-            details['ticker'] = get_text(issuer.find('issuerTradingSymbol'), 'N/A')
-            details['cik'] = get_text(issuer.find('issuerCik'), 'N/A')
+        print(f"    Issuer: {details.issuer_name} ({details.ticker})")
+        print(f"    Owner: {details.owner.name if details.owner else 'N/A'}")
+        print(f"    Transactions: {len(details.transactions)}")
         
-        # Reporting owner
-        owner = soup.find('reportingOwner')
-        if owner:
-            owner_id = owner.find('reportingOwnerId')
-            if owner_id:
-                details['owner_name'] = get_text(owner_id.find('rptOwnerName'), 'N/A')
-            
-            relationship = owner.find('reportingOwnerRelationship')
-            if relationship:
-                titles = []
-                if get_text(relationship.find('isDirector')) == '1':
-                    titles.append('Director')
-                if get_text(relationship.find('isOfficer')) == '1':
-                    title = get_text(relationship.find('officerTitle'))
-                    if title:
-                        titles.append(title)
-                if get_text(relationship.find('isTenPercentOwner')) == '1':
-                    titles.append('10% Owner')
-                
-                details['owner_title'] = ', '.join(titles) if titles else 'Beneficial Owner'
+        return details
         
-        # Transactions
-        transactions = []
+    except Exception as e:
+        if transient_error(e):
+            raise
+        print(f"  Error parsing XML: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+def profiled_parse(content):
+    """parse_form4_document, under cProfile when FORM4_PROFILE_PARSE is set
+    
+    Profiled parses are serialized, since one profiler can't follow several
+    threads at once.
+    """
+    if PARSE_PROFILER is None:
+        return parse_form4_document(content)
+    with PARSE_PROFILER_LOCK:
+        return PARSE_PROFILER.runcall(parse_form4_document, content)
+
+def dump_parse_profile():
+    """Write the parse profile, if one was taken, and print its top entries"""
+    if PARSE_PROFILER is None:
+        return
+    stats = pstats.Stats(PARSE_PROFILER)
+    if not stats.total_calls:
+        return
+    stats.dump_stats(PROFILE_PARSE_FILE)
+    print(f"🔬 Parse profile written to {PROFILE_PARSE_FILE}")
+    stats.sort_stats('cumulative').print_stats(15)
+
+def xml_text(element, path, default=''):
+    """Safely extract stripped text at a child path of an lxml element"""
+    if element is None:
+        return default
+    text = element.findtext(path)
+    text = text.strip() if text else ''
+    return text if text else default
+
+def parse_number(text):
+    """Parse a Form 4 numeric value such as '1,250.5'; None when absent or malformed"""
+    if not text:
+        return None
+    try:
+        return float(text.replace(',', ''))
+    except ValueError:
+        return None
+
+def parse_form4_document(content):
+    """Stream the sections we need out of raw Form 4 XML bytes into a Form4Filing
+    
+    Only issuer, reportingOwner, the transaction rows and footnotes are
+    materialized; each one is cleared as soon as it has been read so large
+    derivative tables never build a full tree.
+    """
+    filing = Form4Filing()
+    non_derivative = []
+    derivative = []
+    footnotes = {}
+    
+    events = etree.iterparse(BytesIO(content), events=('end',), tag=FORM4_SECTIONS, recover=True)
+    for _, elem in events:
+        tag = elem.tag
         
-        # Non-derivative transactions
-        for trans_elem in soup.find_all('nonDerivativeTransaction'):
-            trans = parse_transaction(trans_elem, is_derivative=False)
+        if tag == 'nonDerivativeTransaction':
+            trans = parse_transaction(elem, is_derivative=False)
             if trans:
-                transactions.append(trans)
-        
-        # Derivative transactions
-        for trans_elem in soup.find_all('derivativeTransaction'):
-            trans = parse_transaction(trans_elem, is_derivative=True)
+                non_derivative.append(trans)
+        elif tag == 'derivativeTransaction':
+            trans = parse_transaction(elem, is_derivative=True)
             if trans:
-                transactions.append(trans)
-        
-        details['transactions'] = transactions
+                derivative.append(trans)
+        elif tag == 'footnote':
+            footnotes[elem.get('id')] = ' '.join(''.join(elem.itertext()).split())
+        elif tag == 'issuer' and filing.issuer_name == 'N/A':
+            filing.issuer_name = xml_text(elem, 'issuerName', 'N/A')
+            filing.ticker = xml_text(elem, 'issuerTradingSymbol', 'N/A')
+            filing.cik = xml_text(elem, 'issuerCik', 'N/A')
+        elif tag == 'reportingOwner' and filing.owner is None:
+            filing.owner = parse_reporting_owner(elem)
         
-        print(f"    Issuer: {details.get('issuer_name', 'N/A')} ({details.get('ticker', 'N/A')})")
-        print(f"    Owner: {details.get('owner_name', 'N/A')}")
-        print(f"    Transactions: {len(transactions)}")
+        # Drop what we've read so memory stays flat on giant filings
+        elem.clear(keep_tail=True)
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+    
+    # Non-derivative rows first, matching the order of the form itself
+    filing.transactions = non_derivative + derivative
+    for trans in filing.transactions:
+        # Footnotes come after the tables, so swap ids for their text now
+        if trans.price_note:
+            trans.price_note = footnotes.get(trans.price_note, '')
+        filing.has_buy = filing.has_buy or trans.is_buy
+        filing.has_sell = filing.has_sell or trans.is_sell
+        if trans.amount > 0:
+            filing.total_value += trans.amount
+    return filing
+
+def parse_reporting_owner(owner_elem):
+    """Build a ReportingOwner from a reportingOwner element"""
+    owner = ReportingOwner()
+    
+    owner_id = owner_elem.find('reportingOwnerId')
+    if owner_id is not None:
+        owner.name = xml_text(owner_id, 'rptOwnerName', 'N/A')
+        owner.cik = xml_text(owner_id, 'rptOwnerCik')
+    
+    relationship = owner_elem.find('reportingOwnerRelationship')
+    if relationship is not None:
+        # Flags are usually 1/0 but some filers write true/false
+        owner.is_director = xml_text(relationship, 'isDirector') in ('1', 'true')
+        owner.is_officer = xml_text(relationship, 'isOfficer') in ('1', 'true')
+        owner.is_ten_percent_owner = xml_text(relationship, 'isTenPercentOwner') in ('1', 'true')
         
-        return details
+        titles = []
+        if owner.is_director:
+            titles.append('Director')
+        if owner.is_officer:
+            title = xml_text(relationship, 'officerTitle')
+            if title:
+                titles.append(title)
+        if owner.is_ten_percent_owner:
+            titles.append('10% Owner')
         
-    except Exception as e:
-        print(f"  Error parsing XML: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
+        owner.title = ', '.join(titles) if titles else 'Beneficial Owner'
+    return owner
 
 def parse_transaction(trans_elem, is_derivative=False):
-    """Parse a transaction element"""
-    trans = {'is_derivative': is_derivative}
+    """Parse a transaction element into a Transaction"""
+    trans = Transaction(is_derivative=is_derivative)
     
     try:
-        # Security title
-        if is_derivative:
+        # Security title; derivative rows normally use securityTitle too
+        security = trans_elem.find('securityTitle')
+        if security is None and is_derivative:
             security = trans_elem.find('derivativeSecurityTitle')
-        else:
-            security = trans_elem.find('securityTitle')
-        
-        if security:
-            trans['security'] = get_text(security.find('value'), 'Common Stock')
-        else:
-            trans['security'] = 'Common Stock'
+        trans.security = xml_text(security, 'value', 'Common Stock')
         
         # Transaction date
-        trans_date = trans_elem.find('transactionDate')
-        if trans_date:
-            trans['date'] = get_text(trans_date.find('value'))
+        trans.date = xml_text(trans_elem.find('transactionDate'), 'value')
         
         # Transaction code
-        trans_coding = trans_elem.find('transactionCoding')
-        if trans_coding:
-            code = get_text(trans_coding.find('transactionCode'))
-            trans_map = {
-                'P': 'Purchase',
-                'S': 'Sale',
-                'A': 'Grant/Award',
-                'D': 'Disposition',
-                'F': 'Payment',
-                'M': 'Exercise',
-                'G': 'Gift',
-                'J': 'Other',
-                'K': 'Transaction in Equity Swap'
-            }
-            trans['type'] = trans_map.get(code, code)
-            trans['code'] = code
+        trans.code = xml_text(trans_elem.find('transactionCoding'), 'transactionCode')
+        trans.type = TRANSACTION_TYPES.get(trans.code, trans.code)
+        trans.is_buy = trans.code in BUY_CODES
+        trans.is_sell = trans.code in SELL_CODES
         
         # Transaction amounts
         amounts = trans_elem.find('transactionAmounts')
-        if amounts:
-            shares_elem = amounts.find('transactionShares')
-            trans['shares'] = get_text(shares_elem.find('value'), '0') if shares_elem else '0'
+        if amounts is not None:
+            trans.shares = parse_number(xml_text(amounts.find('transactionShares'), 'value'))
             
             price_elem = amounts.find('transactionPricePerShare')
-            trans['price'] = get_text(price_elem.find('value'), '0') if price_elem else '0'
+            trans.price = parse_number(xml_text(price_elem, 'value'))
+            if price_elem is not None:
+                # Keep the footnote id; parse_form4_document swaps in its text
+                footnote = price_elem.find('footnoteId')
+                if footnote is not None:
+                    trans.price_note = footnote.get('id', '')
         
         # Calculate dollar amount
-        try:
-            shares_num = float(trans.get('shares', '0').replace(',', ''))
-            price_num = float(trans.get('price', '0').replace(',', ''))
-            trans['amount'] = shares_num * price_num
-        except:
-            trans['amount'] = 0
+        if trans.shares is not None and trans.price is not None:
+            trans.amount = trans.shares * trans.price
         
         return trans
         
@@ -318,8 +2759,25 @@ def parse_transaction(trans_elem, is_derivative=False):
         print(f"    Error parsing transaction: {e}")
         return None
 
-def send_discord_notification(filing, details):
-    """Send Discord notification"""
+def send_discord_notification(delivery, filing, details, rules=(), only=None):
+    """Queue a filing's alert for every destination it routes to"""
+    record = {
+        'type': 'filing',
+        'accession': filing.get('accession'),
+        'title': filing.get('title'),
+        'filing_url': filing.get('filing_url'),
+        'filing_date': filing.get('filing_date'),
+        'rules': list(rules),
+        'details': details.to_dict() if details else None
+    }
+    with METRICS.timed('render'):
+        embed = build_filing_embed(filing, details)
+    METRICS.alert_queued(filing.get('accession'), filing.get('filing_date'))
+    delivery.submit(embed, key=filing.get('accession'),
+                    ticker=details.ticker if details else None, rules=rules, record=record, only=only)
+
+def build_filing_embed(filing, details):
+    """Build the Discord embed for a filing"""
     
     # Format the filing date
     filing_date = filing.get('filing_date', '')
@@ -333,7 +2791,7 @@ def send_discord_notification(filing, details):
     else:
         filing_date_fmt = 'N/A'
     
-    if not details or not details.get('transactions'):
+    if not details or not details.transactions:
         # Basic notification
         company = filing.get('title', 'Unknown Company').split(' - ')[0]
         embed = {
@@ -346,63 +2804,39 @@ def send_discord_notification(filing, details):
         }
     else:
         # Rich notification
-        issuer = details.get('issuer_name', 'N/A')
-        ticker = details.get('ticker', 'N/A')
-        owner = details.get('owner_name', 'N/A')
-        title = details.get('owner_title', 'N/A')
+        owner = details.owner or ReportingOwner()
         
         fields = [
-            {"name": "🏢 Company", "value": f"**{issuer}**", "inline": True},
-            {"name": "📈 Ticker", "value": f"**{ticker}**", "inline": True},
+            {"name": "🏢 Company", "value": f"**{details.issuer_name}**", "inline": True},
+            {"name": "📈 Ticker", "value": f"**{details.ticker}**", "inline": True},
             {"name": "📅 Filing Date", "value": filing_date_fmt, "inline": False},
-            {"name": "👤 Insider", "value": owner, "inline": False},
-            {"name": "💼 Title", "value": title, "inline": False}
+            {"name": "👤 Insider", "value": owner.name, "inline": False},
+            {"name": "💼 Title", "value": owner.title, "inline": False}
         ]
         
-        transactions = details.get('transactions', [])
-        total_value = 0
+        transactions = details.transactions
         
         for i, trans in enumerate(transactions[:5], 1):
-            trans_type = trans.get('type', 'N/A')
-            shares = trans.get('shares', '0')
-            price = trans.get('price', '0')
-            amount = trans.get('amount', 0)
-            security = trans.get('security', 'Common Stock')
-            
-            try:
-                shares_fmt = f"{float(shares):,.0f}"
-                if float(price) > 0:
-                    price_fmt = f"${float(price):,.2f}"
-                    amount_fmt = f"${amount:,.2f}"
-                else:
-                    price_fmt = "N/A"
-                    amount_fmt = "N/A"
-                
-                if amount > 0:
-                    total_value += amount
-            except:
-                shares_fmt = shares
-                price_fmt = "N/A"
-                amount_fmt = "N/A"
-            
-            code = trans.get('code', '')
-            if code in ['P', 'A', 'M', 'X']:
+            if trans.is_buy:
                 emoji = "🟢"
-            elif code in ['S', 'D', 'F']:
+            elif trans.is_sell:
                 emoji = "🔴"
             else:
                 emoji = "🔵"
             
-            value_text = f"{emoji} **{trans_type}**\n"
+            shares_fmt = f"{trans.shares:,.0f}" if trans.shares is not None else "N/A"
+            value_text = f"{emoji} **{trans.type or 'N/A'}**\n"
             value_text += f"Shares: **{shares_fmt}**"
-            if price_fmt != "N/A":
-                value_text += f" @ {price_fmt}"
-            if amount_fmt != "N/A":
-                value_text += f"\nValue: **{amount_fmt}**"
-            if trans.get('is_derivative'):
-                value_text += f"\nType: Derivative ({security})"
+            if trans.price:
+                value_text += f" @ ${trans.price:,.2f}" + ("*" if trans.price_note else "")
+                value_text += f"\nValue: **${trans.amount:,.2f}**"
+            if trans.is_derivative:
+                value_text += f"\nType: Derivative ({trans.security})"
             else:
-                value_text += f"\nSecurity: {security}"
+                value_text += f"\nSecurity: {trans.security}"
+            if trans.price_note:
+                note = trans.price_note if len(trans.price_note) <= 150 else trans.price_note[:147] + '...'
+                value_text += f"\n*{note}"
             
             fields.append({
                 "name": f"Transaction {i}" if len(transactions) > 1 else "Transaction",
@@ -410,19 +2844,17 @@ def send_discord_notification(filing, details):
                 "inline": False
             })
         
-        if len(transactions) > 1 and total_value > 0:
+        if len(transactions) > 1 and details.total_value > 0:
             fields.append({
                 "name": "💰 Total Value",
-                "value": f"**${total_value:,.2f}**",
+                "value": f"**${details.total_value:,.2f}**",
                 "inline": False
             })
         
-        has_buy = any(t.get('code') in ['P', 'A', 'M', 'X'] for t in transactions)
-        has_sell = any(t.get('code') in ['S', 'D', 'F'] for t in transactions)
-        color = 5763719 if has_buy and not has_sell else 15158332 if has_sell else 3447003
+        color = 5763719 if details.has_buy and not details.has_sell else 15158332 if details.has_sell else 3447003
         
         embed = {
-            "title": f"📊 Form 4: {ticker}",
+            "title": f"📊 Form 4: {details.ticker}",
             "url": filing['filing_url'],
             "color": color,
             "fields": fields,
@@ -430,25 +2862,967 @@ def send_discord_notification(filing, details):
             "timestamp": datetime.utcnow().isoformat()
         }
     
+    return embed
+
+def send_cluster_alert(delivery, cluster, attempts=0, only=None):
+    """Queue a high-priority Discord alert for a detected cluster buy
+    
+    Its outcome comes back through apply_deliveries(), which has the cluster
+    detector retry it if a destination fails.
+    """
+    print(f"  🚨 Cluster buy: {cluster['ticker']} - {len(cluster['buyers'])} insiders, "
+          f"${cluster['net_flow']:,.0f} net in {CLUSTER_WINDOW_DAYS} days")
+    record = {'type': 'cluster', 'window_days': CLUSTER_WINDOW_DAYS, **cluster}
+    if cluster['sell_value'] <= 0:
+        record['ratio'] = None  # Infinite, which JSON can't carry
+    with METRICS.timed('render'):
+        embed = build_cluster_embed(cluster)
+    delivery.submit(embed, key=CLUSTER_DETECTOR.sent(cluster, attempts), urgent=True, ticker=cluster['ticker'],
+                    severity='cluster', record=record, only=only)
+
+def retry_cluster_alerts(delivery):
+    """Resend failed cluster alerts whose backoff has expired, to the destinations that failed"""
+    retries = CLUSTER_DETECTOR.due_retries()
+    for retry in retries:
+        print(f"↻ Retrying cluster alert for {retry['cluster']['ticker']} (attempt {retry['attempts'] + 1})")
+        send_cluster_alert(delivery, retry['cluster'], retry['attempts'], only=retry['destinations'])
+    return len(retries)
+
+def build_cluster_embed(cluster):
+    """Build the Discord embed for a cluster buy alert"""
+    if cluster['sell_value'] > 0:
+        ratio = f"{cluster['ratio']:,.1f}x"
+    else:
+        ratio = "No sales"
+    buyers = '\n'.join(cluster['buyers'][:10])
+    if len(cluster['buyers']) > 10:
+        buyers += f"\n...and {len(cluster['buyers']) - 10} more"
+    
+    return {
+        "title": f"🚨 Cluster Buy: {cluster['ticker']}",
+        "description": f"**{cluster['issuer_name']}** - {len(cluster['buyers'])} insiders bought on the "
+                       f"open market in the last {CLUSTER_WINDOW_DAYS} days",
+        "color": 15844367,
+        "fields": [
+            {"name": "💰 Net Flow", "value": f"**${cluster['net_flow']:,.2f}**", "inline": True},
+            {"name": "⚖ Buy/Sell", "value": ratio, "inline": True},
+            {"name": "🟢 Bought", "value": f"${cluster['buy_value']:,.2f}", "inline": True},
+            {"name": "🔴 Sold", "value": f"${cluster['sell_value']:,.2f}", "inline": True},
+            {"name": "👥 Buyers", "value": buyers, "inline": False}
+        ],
+        "footer": {"text": "SEC EDGAR Form 4 Tracker"},
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+def print_transport_stats():
+    """Print connection reuse, transfer and filing cache counters for this run"""
+    stats = HTTP.stats()
+    print(f"🌐 HTTP: {stats['requests']} request(s), {stats['not_modified']} not modified, "
+          f"{stats['connections_opened']} connection(s) opened, {stats['connections_reused']} reused, "
+          f"{stats['bytes_received'] / 1024:,.1f} KB received")
+    cache = FILING_CACHE.stats()
+    print(f"🗄 Filing cache: {cache['parsed_hits']} parsed hit(s), {cache['raw_hits']} raw hit(s), "
+          f"{cache['misses']} miss(es), {cache['hit_rate']:.0%} hit rate")
+
+def fetch_filing_details(filing):
+    """Resolve and parse one filing; safe to run on a worker thread
+    
+    Returns (xml_url, details, error), where error describes a transient
+    failure that is worth retrying later; xml_url is still set when the
+    document was found but its download failed.
+    """
+    accession = filing.get('accession')
+    xml_url = None
+    
     try:
-        response = requests.post(DISCORD_WEBHOOK, json={"embeds": [embed]}, timeout=10)
-        response.raise_for_status()
-        print(f"  ✓ Discord notification sent")
+        # The store row's URL covers filings queued after this process loaded XML_URL_CACHE
+        xml_url = filing.get('xml_url') or XML_URL_CACHE.get(accession)
+        # A cached parse with a known document URL needs no requests at all
+        if xml_url:
+            details = FILING_CACHE.get_parsed(accession)
+            if details is not None:
+                return xml_url, details, None
+        else:
+            xml_url = get_filing_xml_url(filing['filing_url'])
+        if not xml_url:
+            return None, None, None
+        return xml_url, parse_form4_xml(xml_url, accession), None
     except Exception as e:
-        print(f"  ✗ Discord error: {e}")
+        return xml_url, None, str(e) or type(e).__name__
 
-def should_notify_filing(details, ticker_filters):
-    """Check if a filing should generate a notification based on filters
+def backfill_index_sources(source):
+    """Expand a backfill source into (name, loader) pairs for each index file
     
-    This is a secondary check in case ticker wasn't in the title.
+    A source is a local .idx file, a directory of them, a quarter such as
+    2025-Q3 (full-index master.idx) or a day such as 2025-11-24 (daily-index).
     """
-    # If no filters, notify everything
-    if not ticker_filters:
-        return True
+    if os.path.isdir(source):
+        names = sorted(os.path.join(directory, name)
+                       for directory, _, files in os.walk(source)
+                       for name in files if name.endswith('.idx'))
+        return [(path, lambda path=path: read_local_index(path)) for path in names]
+    
+    if os.path.isfile(source):
+        return [(source, lambda: read_local_index(source))]
+    
+    quarter = re.fullmatch(r'(\d{4})-Q([1-4])', source.upper())
+    if quarter:
+        url = f"{SEC_FULL_INDEX_BASE}/{quarter.group(1)}/QTR{quarter.group(2)}/master.idx"
+        return [(url, lambda: read_remote_index(url))]
+    
+    day = re.fullmatch(r'(\d{4})-(\d{2})-(\d{2})', source)
+    if day:
+        year, month, date = day.groups()
+        url = f"{SEC_DAILY_INDEX_ARCHIVE}/{year}/QTR{(int(month) - 1) // 3 + 1}/master.{year}{month}{date}.idx"
+        return [(url, lambda: read_remote_index(url))]
+    
+    raise ValueError(f"Not an index file, directory, quarter (YYYY-QN) or day (YYYY-MM-DD): {source}")
+
+def read_local_index(path):
+    with open(path, 'r', encoding='latin-1') as f:
+        return f.read()
+
+def read_remote_index(url):
+    print(f"  Downloading {url}")
+    response = sec_get(url, INDEX_PAGE_ACCEPT, timeout=120)
+    response.raise_for_status()
+    return response.content.decode('latin-1')
+
+def parse_edgar_index(text):
+    """Form 4 and 4/A filings from a master.idx or form.idx file, one per accession
+    
+    master.idx rows are pipe-delimited (CIK|Company|Form|Date|File); form.idx
+    rows are fixed-width with the form type first and CIK, date and file last.
+    Each filing is listed once per party, so rows are merged by accession.
+    """
+    filings = {}
+    in_rows = False
+    
+    for line in text.splitlines():
+        if not in_rows:
+            in_rows = line.startswith('---')
+            continue
+        
+        if '|' in line:
+            parts = line.split('|')
+            if len(parts) != 5:
+                continue
+            cik, company, form, filed, filename = (part.strip() for part in parts)
+        else:
+            parts = line.rsplit(None, 3)
+            if len(parts) != 4 or not parts[0].split():
+                continue
+            form = parts[0].split()[0]
+            company = parts[0][len(form):].strip()
+            cik, filed, filename = parts[1:]
+        
+        if form not in SUBMISSIONS_FORMS or not cik.isdigit():
+            continue
+        
+        accession = filename.rsplit('/', 1)[-1].replace('.txt', '')
+        filing = filings.setdefault(accession, {
+            'accession': accession,
+            'form': form,
+            'filed': filed,
+            'ciks': set(),
+            'filing_url': f"{archive_folder_url(int(cik), accession)}/{accession}-index.htm"
+        })
+        filing['ciks'].add(int(cik))
+    
+    return list(filings.values())
+
+def fetch_backfill_document(filing, xml_dir=None):
+    """Get a filing's parsed details or raw XML for the backfill; runs on a fetch thread
+    
+    Returns ('parsed', details), ('raw', xml bytes) or (None, error message).
+    """
+    accession = filing['accession']
+    try:
+        if xml_dir:
+            with open(os.path.join(xml_dir, f"{accession}.xml"), 'rb') as f:
+                return 'raw', f.read()
+        
+        details = FILING_CACHE.get_parsed(accession)
+        if details is not None:
+            return 'parsed', details
+        
+        content = FILING_CACHE.get_raw(accession)
+        if content is None:
+            xml_url = get_filing_xml_url(filing['filing_url'])
+            if not xml_url:
+                return None, "no XML document"
+            response = sec_get(xml_url, XML_ACCEPT)
+            response.raise_for_status()
+            content = response.content
+            FILING_CACHE.put_raw(accession, content)
+        return 'raw', content
+        
+    except Exception as e:
+        return None, str(e)
+
+def run_backfill(sources, xml_dir=None, watch_all=False):
+    """Load historical Form 4s from EDGAR index files into the history store
+    
+    Downloads run on a thread pool under the shared SEC rate limiter and
+    parsing runs on a process pool, so the rate limit stays the bottleneck.
+    Completed filings and index files are checkpointed in the history store,
+    so an interrupted backfill resumes where it left off.
+    """
+    history = HistoryStore()
+    exporter = TransactionExporter() if EXPORT_FORMAT else None
+    rules = AlertRules([]) if watch_all else load_alert_rules()
+    watched = rules.issuer_ciks()
+    if rules and watched is None:
+        print("⚠ Falling back to every Form 4 in the index; the ticker check happens after parsing")
+    
+    # Checkpoints only count for the same filter scope
+    scope = rules.scope
+    totals = {'stored': 0, 'failed': 0, 'skipped': 0}
+    started = time.monotonic()
+    
+    with ThreadPoolExecutor(max_workers=BACKFILL_FETCH_WORKERS) as fetchers, \
+            ProcessPoolExecutor(max_workers=BACKFILL_PARSE_WORKERS, mp_context=multiprocessing.get_context('spawn')) as parsers:
+        for source in sources:
+            for name, load in backfill_index_sources(source):
+                checkpoint = f"{name} [{scope}]"
+                if history.source_done(checkpoint):
+                    print(f"✓ {name} already backfilled")
+                    continue
+                
+                print(f"📚 Reading {name}")
+                filings = parse_edgar_index(load())
+                if watched is not None:
+                    filings = [f for f in filings if f['ciks'] & watched]
+                todo = [f for f in filings if f['accession'] not in history]
+                print(f"  {len(filings)} Form 4 filing(s), {len(todo)} not yet stored")
+                
+                failed = 0
+                for start in range(0, len(todo), BACKFILL_CHUNK_SIZE):
+                    chunk = todo[start:start + BACKFILL_CHUNK_SIZE]
+                    stored, chunk_failed, skipped = backfill_chunk(chunk, rules, xml_dir, fetchers, parsers, history,
+                                                             exporter)
+                    totals['stored'] += stored
+                    totals['skipped'] += skipped
+                    failed += chunk_failed
+                    
+                    elapsed = time.monotonic() - started
+                    print(f"  {start + len(chunk)}/{len(todo)} processed, {totals['stored']} stored, "
+                          f"{HTTP.request_count / elapsed:.1f} req/s")
+                
+                totals['failed'] += failed
+                if failed:
+                    print(f"  ⚠ {failed} filing(s) failed; run the backfill again to retry them")
+                else:
+                    history.mark_source_done(checkpoint)
+    
+    history.close()
+    if exporter:
+        exporter.close()
+    print(f"\n✓ Backfill stored {totals['stored']} filing(s), skipped {totals['skipped']} "
+          f"(not in filter), {totals['failed']} failed in {time.monotonic() - started:.0f}s")
+    print_transport_stats()
+    print_export_stats(exporter)
+
+def backfill_chunk(chunk, rules, xml_dir, fetchers, parsers, history, exporter=None):
+    """Fetch, parse and store one chunk of filings; returns (stored, failed, skipped)"""
+    parse_jobs = {}
+    records = []
+    failed = 0
+    
+    fetch_jobs = {fetchers.submit(fetch_backfill_document, filing, xml_dir): filing for filing in chunk}
+    for job in as_completed(fetch_jobs):
+        filing = fetch_jobs[job]
+        kind, payload = job.result()
+        if kind == 'parsed':
+            records.append((filing, payload))
+        elif kind == 'raw':
+            # Hand the CPU work to the process pool as soon as each download lands
+            parse_jobs[parsers.submit(parse_form4_document, payload)] = filing
+        else:
+            print(f"  ✗ {filing['accession']}: {payload}")
+            failed += 1
+    
+    for job in as_completed(parse_jobs):
+        filing = parse_jobs[job]
+        try:
+            details = job.result()
+        except Exception as e:
+            print(f"  ✗ {filing['accession']}: could not parse XML: {e}")
+            failed += 1
+            continue
+        FILING_CACHE.put_parsed(filing['accession'], details)
+        records.append((filing, details))
+    
+    kept = [(filing, details) for filing, details in records if rules.match(filing, details)]
+    history.add_filings(kept)
+    if exporter:
+        for filing, details in kept:
+            exporter.add(filing, details)
+    return len(kept), failed, len(records) - len(kept)
+
+def query_filters(options):
+    """Turn query options (CLI flags or URL parameters, all strings) into HistoryStore.query() arguments
+    
+    Options are QUERY_OPTIONS: code and role take comma-separated lists,
+    since/until are YYYY-MM-DD filing dates and days means since that many
+    days ago. Returns (filters, limit, cursor); raises ValueError on bad input.
+    """
+    unknown = set(options) - set(QUERY_OPTIONS)
+    if unknown:
+        raise ValueError(f"unknown query option(s) {sorted(unknown)}, expected some of {list(QUERY_OPTIONS)}")
+    
+    filters = {}
+    try:
+        if options.get('ticker'):
+            filters['ticker'] = options['ticker'].upper()
+        for name in ('cik', 'owner_cik'):
+            if options.get(name):
+                filters[name] = int(options[name])
+        if options.get('owner'):
+            filters['owner'] = options['owner']
+        if options.get('code'):
+            filters['codes'] = [code.strip().upper() for code in options['code'].split(',') if code.strip()]
+        if options.get('role'):
+            filters['roles'] = [role.strip().lower() for role in options['role'].split(',') if role.strip()]
+            unknown = set(filters['roles']) - set(RULE_ROLES)
+            if unknown:
+                raise ValueError(f"unknown role(s) {sorted(unknown)}, expected some of {sorted(RULE_ROLES)}")
+        if options.get('min_value'):
+            filters['min_value'] = float(options['min_value'])
+        if options.get('days'):
+            filters['since'] = (date.today() - timedelta(days=int(options['days']))).isoformat()
+        for name in ('since', 'until'):
+            if options.get(name):
+                filters[name] = date.fromisoformat(options[name]).isoformat()
+        limit = int(options.get('limit') or QUERY_PAGE_SIZE)
+    except ValueError as e:
+        raise ValueError(f"bad query option: {e}")
+    if not 0 < limit <= QUERY_MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {QUERY_MAX_PAGE_SIZE}")
+    return filters, limit, options.get('cursor')
+
+def query_page(history, filters, limit, cursor=None):
+    """Yield one page of query results as JSON-ready dicts
+    
+    Ends with {'next_cursor': ...} when there are more results to fetch.
+    """
+    returned = 0
+    results = history.query(**filters, cursor=cursor, limit=limit + 1)
+    try:
+        for accession, filed, details in results:
+            if returned == limit:
+                yield {'next_cursor': HistoryStore.cursor(*last)}
+                return
+            yield {'accession': accession, 'filed': filed, **details.to_dict()}
+            returned += 1
+            last = (filed, accession)
+    finally:
+        results.close()
+
+def print_query_results(results):
+    """Print query_page() results for a terminal"""
+    count = 0
+    for result in results:
+        if 'next_cursor' in result:
+            print(f"\n… more results: add --cursor '{result['next_cursor']}'")
+            break
+        count += 1
+        owner = result['owner'] or {}
+        print(f"{result['filed']}  {result['ticker']:<6} {owner.get('name', 'N/A')} ({owner.get('title', '')})"
+              f"  {result['accession']}")
+        for trans in result['transactions']:
+            shares = f"{trans['shares']:,.0f} sh" if trans['shares'] is not None else '? sh'
+            price = f" @ ${trans['price']:,.2f}" if trans['price'] is not None else ''
+            print(f"    {trans['code'] or '?'} {trans['date']}  {shares}{price}  ${trans['amount']:,.0f}"
+                  f"  {trans['security']}")
+    print(f"{count} filing(s)")
+
+def start_query_server(port, host=QUERY_HOST):
+    """Serve transaction queries on /transactions from a background thread
+    
+    Takes the query options as URL parameters and streams matching filings
+    as newline-delimited JSON: one Form4Filing per line, plus its accession
+    number and filing date, e.g. /transactions?ticker=NVDA&role=officer&code=S&min_value=1000000&days=90
+    """
+    class QueryHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != '/transactions':
+                self.send_error(404)
+                return
+            try:
+                options = {name: values[-1] for name, values in parse_qs(url.query).items()}
+                filters, limit, cursor = query_filters(options)
+                history = HistoryStore(readonly=True)
+            except (ValueError, sqlite3.Error) as e:
+                self.send_error(400, str(e))
+                return
+            
+            # No Content-Length: results are written as they are read, and the
+            # connection closes at the end of the page
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.end_headers()
+            try:
+                for result in query_page(history, filters, limit, cursor):
+                    self.wfile.write(json.dumps(result).encode() + b'\n')
+            except ValueError as e:
+                self.wfile.write(json.dumps({'error': str(e)}).encode() + b'\n')
+            finally:
+                history.close()
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer((host, port), QueryHandler)
+    threading.Thread(target=server.serve_forever, name='queries', daemon=True).start()
+    print(f"🔎 Transaction queries on http://{host or '0.0.0.0'}:{server.server_port}/transactions")
+    return server
+
+def run_query_server(port, host=QUERY_HOST):
+    """Serve transaction queries until SIGTERM/SIGINT"""
+    stop = stop_on_signals()
+    
+    server = start_query_server(port, host)
+    stop.wait()
+    server.shutdown()
+    print(f"✓ Query server stopped\n{'='*70}\n")
+
+def start_metrics_server(port):
+    """Serve METRICS as Prometheus text on /metrics from a background thread"""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = METRICS.prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes every few seconds would drown out the poll log
+    
+    server = ThreadingHTTPServer(('', port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    print(f"📈 Prometheus metrics on http://localhost:{server.server_port}/metrics")
+    return server
+
+def write_metrics_summary():
+    """Save this run's metrics as JSON and print the headline numbers"""
+    summary = METRICS.summary()
+    with open(METRICS_SUMMARY_FILE, 'w') as f:
+        json.dump(summary, f, indent=2)
+    
+    for destination, latency in sorted(summary['alert_latency'].items()):
+        print(f"📈 Alert latency to {destination}: p50 {latency['p50_seconds']:.0f}s, "
+              f"p95 {latency['p95_seconds']:.0f}s, max {latency['max_seconds']:.0f}s over {latency['count']} alert(s)")
+    stages = ', '.join(f"{stage} {stats['total_seconds']:.2f}s/{stats['count']}"
+                       for stage, stats in summary['stages'].items())
+    print(f"📈 Stage time (total/count): {stages or 'none'} - details in {METRICS_SUMMARY_FILE}")
+
+def print_export_stats(exporter):
+    """Print what the transaction exporter wrote this run"""
+    if exporter:
+        print(f"📦 Export: {exporter.rows_written} transaction row(s) into {exporter.files_written} new "
+              f"{exporter.fmt} file(s) under {exporter.directory}/")
+
+def print_rule_stats(rules):
+    """Print how often each rule matched, and where it turned filings away"""
+    for rule in rules.rules:
+        print(f"📏 Rule {rule.name}: {rule.hits} hit(s), {rule.entry_rejected} rejected before fetching, "
+              f"{rule.document_rejected} after parsing")
+
+def print_filters(rules):
+    """Print which tickers or rules this cycle is filtering on"""
+    if rules.watchlist:
+        print(f"📋 Active ticker filters: {', '.join(sorted(rules.watchlist))}")
+        print(f"   (Matched on issuer CIK from the feed, XML checked when ambiguous)\n")
+    elif rules:
+        print(f"📋 Alert rules from {ALERT_RULES_FILE}:")
+        for rule in rules.rules:
+            conditions = ', '.join(f"{key}={value}" for key, value in rule.spec.items() if key != 'name')
+            print(f"   {rule.name}: {conditions or 'everything'}")
+        print()
+    else:
+        print("📋 No filters active - monitoring all tickers\n")
+    if FORM4_SOURCE == 'submissions':
+        print("📡 Source: per-issuer submissions polling\n")
+
+def load_state(shard=None, sharded=False):
+    """Open the filing store and load the caches kept in it
+    
+    A sharded worker passes its shard and gets that shard's cluster window.
+    Alerts a previous run stopped in the middle of delivering are
+    dead-lettered, since they may have been sent; in sharded mode (workers,
+    and the coordinator with sharded) that is left to the workers' loop.
+    """
+    store = FilingStore()
+    migrate_json_state(store)
+    if shard is None and not sharded:
+        abandoned = store.abandon_interrupted()
+        if abandoned:
+            print(f"☠ {abandoned} alert(s) were mid-delivery when the last run stopped; "
+                  f"resend them with retry-dead")
+    XML_URL_CACHE.update(store.xml_urls())
+    HTTP.validators.update(store.get_meta('http_validators', {}))
+    CLUSTER_DETECTOR.load(store.get_meta(cluster_window_key(shard), {}))
+    return store
+
+def cluster_window_key(shard=None):
+    """Meta key of the cluster window; each shard's issuers have their own"""
+    return 'cluster_window' if shard is None else f"cluster_window/{shard}"
+
+def save_state(store, shard=None):
+    """Persist HTTP validators and the cluster window, and drop filings past the retention window
+    
+    Filing progress is already written as it happens; this only covers the
+    pieces that are kept in memory during a cycle. The HTTP validators
+    belong to whoever polls, so a sharded worker only saves its cluster window.
+    """
+    if shard is None:
+        store.set_meta('http_validators', HTTP.validators)
+    store.set_meta(cluster_window_key(shard), CLUSTER_DETECTOR.to_dict())
+    evicted = store.evict()
+    if evicted:
+        print(f"🧹 Evicted {evicted} finished filing(s) past their retention window")
+    removed, cache_bytes = FILING_CACHE.evict()
+    if removed:
+        print(f"🧹 Evicted {removed} cached file(s), cache now {cache_bytes / 1024 / 1024:,.1f} MB")
+
+def apply_deliveries(store, delivery):
+    """Record the outcome of finished deliveries in the store
+    
+    Alerts a destination gave up on are scheduled for another try, to those
+    destinations only: filing alerts in the store, cluster alerts in the
+    cluster detector.
+    """
+    retried = 0
+    for key, failed_destinations in delivery.completed():
+        METRICS.alert_settled(key)
+        if key and key.startswith('cluster:'):
+            status = CLUSTER_DETECTOR.settled(key, failed_destinations)
+            if status == 'dead':
+                print(f"☠ {key}: out of retries, cluster alert dropped")
+        elif not failed_destinations:
+            if key:
+                store.set_status(key, 'notified')
+            continue
+        elif key:
+            status, delay = store.schedule_retry(
+                key, f"delivery failed: {', '.join(failed_destinations)}", failed_destinations)
+            if status == 'dead':
+                print(f"☠ {key}: out of retries, moved to the dead-letter list")
+        else:
+            status = 'dropped'
+            print(f"✗ An untracked alert could not be delivered to {', '.join(failed_destinations)}")
+        retried += status == 'retry'
+    if retried:
+        print(f"✗ {retried} alert(s) could not be delivered; they will be retried")
+
+def poll_filings(store, rules, shards=None):
+    """Fetch new filings once and queue the ones a rule could match
+    
+    With shards, queued filings are assigned to sharded workers.
+    Returns (new_filings, new_count); new_filings is None when the feed was
+    not modified.
+    """
+    if FORM4_SOURCE == 'submissions':
+        new_filings = fetch_submissions_filings(store, rules)
+    else:
+        # Fetch ALL new filings from SEC RSS feed, back to the watermark
+        new_filings = fetch_new_form4_filings(store.get_meta('watermark'), store)
+    
+    new_count = 0
+    if new_filings:
+        # Drop filings no rule can match before spending any requests on them
+        candidates, rejected = rules.prefilter(new_filings)
+        if rejected:
+            store.enqueue(rejected, status='skipped')
+            print(f"  ⊝ Skipped {len(rejected)} filing(s) by issuer CIK without fetching them")
+        new_count = store.enqueue(candidates, shards=shards)
+        XML_URL_CACHE.update((f['accession'], f['xml_url']) for f in candidates if f.get('xml_url'))
+        
+        if FORM4_SOURCE != 'submissions':
+            newest = new_filings[-1]
+            store.set_meta('watermark', {'accession': newest['accession'], 'updated': newest['filing_date']})
+    
+    return new_filings, new_count
+
+def run_cycle(store, rules, delivery, exporter=None, history=None):
+    """Poll for new filings once, queue them and drain part of the backlog
+    
+    Parsed filings also go through the cluster detector, and to the exporter
+    and history store when they are given.
+    Returns (changed, new_count); changed is False when the feed was not
+    modified and there was no backlog to work on.
+    """
+    new_filings, new_count = poll_filings(store, rules)
+    resent = retry_cluster_alerts(delivery)
+    
+    batch = store.backlog(BACKLOG_BATCH_SIZE)
+    if not batch:
+        print("No new filings to process")
+        return new_filings is not None or resent > 0, 0
+    
+    print(f"\n🆕 Found {new_count} new filing(s), {store.backlog_size()} in backlog")
+    if rules:
+        print(f"   Will check each filing's XML to match filters\n")
+    else:
+        print()
+    
+    retried_count = process_batch(store, rules, delivery, batch, exporter, history=history)
+    
+    remaining = store.backlog_size()
+    if remaining:
+        print(f"⏳ {remaining} filing(s) left in backlog for the next cycle")
+    waiting = store.retry_size()
+    if waiting:
+        print(f"↻ {waiting} filing(s) waiting to retry ({retried_count} failed this cycle)")
+    
+    return True, new_count
+
+def process_batch(store, rules, delivery, batch, exporter=None, owner=None, history=None):
+    """Fetch, parse and match a batch of queued filings, and queue their alerts
+    
+    owner is the sharded worker holding the batch's leases; an alert is only
+    queued while its lease is still held. Returns how many transient failures
+    were scheduled for a retry.
+    """
+    notified_count = 0
+    skipped_count = 0
+    retried_count = 0
+    parsed = []  # (filing, details) for the history store
+    
+    # Backlog is oldest first; workers fetch concurrently under the shared SEC rate limiter
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as executor:
+        results = executor.map(fetch_filing_details, batch)
+        
+        # map() yields in submission order, so alerts still go out oldest first
+        for filing, (xml_url, details, error) in zip(batch, results):
+            title = filing.get('title', 'Unknown')
+            title_short = title[:65] + '...' if len(title) > 65 else title
+            print(f"📄 {title_short}")
+            # Set when an earlier alert reached some destinations but not these
+            redeliver_to = json.loads(filing['destinations']) if filing.get('destinations') else None
+            
+            if error:
+                # Park it and move on; the backlog picks it up again once the backoff expires
+                status, delay = store.schedule_retry(filing['accession'], error, redeliver_to, xml_url)
+                if status == 'dead':
+                    print(f"  ☠ {error} - out of retries, moved to the dead-letter list")
+                else:
+                    print(f"  ↻ {error} - retrying in {delay:.0f}s")
+                retried_count += 1
+            elif xml_url:
+                store.set_status(filing['accession'], 'parsed' if details else 'fetched', xml_url=xml_url)
+                
+                # Now the rules can look at the ticker, owner and transactions
+                matched = rules.match(filing, details)
+                if matched:
+                    if rules and not rules.watchlist:
+                        print(f"  ✓ Matched {', '.join(matched)}")
+                    # Claimed before queueing, so a crash can't make it look unsent
+                    if store.claim_alert(filing['accession'], owner):
+                        send_discord_notification(delivery, filing, details, matched, only=redeliver_to)
+                        notified_count += 1
+                    else:
+                        print(f"  ⚠ Lease lost before the alert was queued - left to its new worker")
+                else:
+                    ticker = details.ticker if details else 'N/A'
+                    print(f"  ⊝ Skipped ({ticker} matched no filter or rule)")
+                    store.set_status(filing['accession'], 'skipped')
+                    skipped_count += 1
+                
+                # The detector sees every parsed filing, but only alerts on watched tickers
+                for cluster in CLUSTER_DETECTOR.add(filing, details):
+                    if rules.watches_issuer(details):
+                        send_cluster_alert(delivery, cluster)
+                if exporter and not redeliver_to:  # Already exported on the first pass
+                    exporter.add(filing, details)
+                if details:
+                    parsed.append((filing, details))
+            else:
+                print(f"  ✗ Could not find XML document")
+                if not rules:  # Only notify for parsing failures if no filters
+                    if store.claim_alert(filing['accession'], owner):
+                        send_discord_notification(delivery, filing, None, only=redeliver_to)
+                        notified_count += 1
+                else:
+                    store.set_status(filing['accession'], 'skipped')
+            
+            print()
+    
+    if history and parsed:
+        history.add_filings(parsed)
+    apply_deliveries(store, delivery)
+    
+    if rules:
+        print(f"✓ Queued {notified_count} notification(s), skipped {skipped_count} (not in filter)")
+    else:
+        print(f"✓ Queued {notified_count} notification(s)")
+    return retried_count
+
+def poll_interval(now=None):
+    """Base seconds between polls for the current US/Eastern time of day"""
+    now = (now or datetime.now(EASTERN)).astimezone(EASTERN)
+    minutes = now.hour * 60 + now.minute
+    
+    if now.weekday() >= 5:
+        return POLL_INTERVALS['weekend']
+    if 16 * 60 <= minutes < 20 * 60:
+        return POLL_INTERVALS['after_hours']  # Post-close filing surge
+    if 9 * 60 + 30 <= minutes < 16 * 60:
+        return POLL_INTERVALS['market']
+    if 6 * 60 <= minutes < 9 * 60 + 30:
+        return POLL_INTERVALS['pre_market']
+    return POLL_INTERVALS['overnight']
+
+def idle_interval(idle_cycles):
+    """Seconds until the next poll: the market-clock interval, stretched after quiet polls"""
+    base = poll_interval()
+    return min(base * IDLE_BACKOFF_FACTOR ** max(idle_cycles - 1, 0), base * IDLE_BACKOFF_LIMIT)
+
+def stop_on_signals(received='Received'):
+    """An Event set by SIGTERM/SIGINT, so a long-running loop can flush state before exiting"""
+    stop = threading.Event()
+    
+    def request_stop(signum, frame):
+        print(f"\n⏹ {received} signal {signum}, shutting down...")
+        stop.set()
+    
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    return stop
+
+def run_daemon():
+    """Poll continuously, keeping connections and state in memory
+    
+    The interval follows the market clock and stretches while the feed stays
+    quiet. SIGTERM/SIGINT stop the loop and flush state before exiting.
+    """
+    stop = stop_on_signals()
+    
+    store = load_state()
+    history = HistoryStore()
+    delivery = load_alert_router()
+    exporter = TransactionExporter() if EXPORT_FORMAT else None
+    metrics_server = start_metrics_server(METRICS_PORT) if METRICS_PORT else None
+    idle_cycles = 0
+    print("🔁 Daemon mode - polling continuously (Ctrl+C to stop)\n")
+    rules = load_alert_rules()
+    print_filters(rules)
+    
+    while not stop.is_set():
+        print(f"⏱ Poll at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        try:
+            rules = reload_alert_rules(rules)  # Pick up edits without a restart
+        except ValueError as e:
+            print(f"✗ {e} - keeping the previous rules")
+        
+        try:
+            with METRICS.timed('cycle'):
+                changed, new_count = run_cycle(store, rules, delivery, exporter, history)
+        except Exception as e:
+            print(f"✗ Cycle failed: {e}")
+            import traceback
+            traceback.print_exc()
+            changed, new_count = False, 0
+        METRICS.record_cycle(store, delivery, exporter)
+        METRICS.record_rules(rules)
+        
+        if changed:
+            save_state(store)
+            print_rule_stats(rules)
+        if exporter and exporter.due():
+            exporter.flush()
+        
+        if changed and store.backlog_size():
+            continue  # Keep draining; the rate limiter sets the pace
+        
+        idle_cycles = 0 if new_count else idle_cycles + 1
+        interval = idle_interval(idle_cycles)
+        print(f"💤 Next poll in {interval:.0f}s\n")
+        stop.wait(interval)
+        apply_deliveries(store, delivery)
+    
+    delivery.close()
+    apply_deliveries(store, delivery)
+    if exporter:
+        exporter.close()
+    save_state(store)
+    store.close()
+    history.close()
+    if metrics_server:
+        metrics_server.shutdown()
+    print_transport_stats()
+    print_export_stats(exporter)
+    dump_parse_profile()
+    print(f"✓ State flushed, daemon stopped\n{'='*70}\n")
+
+def share_sec_budget():
+    """Swap the in-process SEC limiter for one whose budget lives in the filing store
+    
+    Every process in sharded mode calls this, so together they stay within
+    SEC_MAX_REQUESTS_PER_SECOND.
+    """
+    global SEC_RATE_LIMITER
+    SEC_RATE_LIMITER = SharedRateLimiter(STATE_DB, SEC_MAX_REQUESTS_PER_SECOND)
+
+def worker_alive(owner):
+    """Whether the local process behind a lease owner name is still running"""
+    try:
+        os.kill(int(owner.split('-')[2]), 0)
+    except (IndexError, ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        return True  # Someone else's process, so the pid is in use
+    return True
+
+def spawn_worker(shard):
+    """Start a worker process for one shard, with the same interpreter and script"""
+    return subprocess.Popen([sys.executable, os.path.abspath(__file__), 'worker', str(shard)])
+
+def run_coordinator(shards, spawn=True):
+    """Poll for new filings and queue them for `shards` worker processes
+    
+    Each filing goes to shard issuer CIK % shards, so one issuer's filings are
+    always worked on by the same worker, oldest first. The coordinator only
+    polls; workers do the fetching, parsing and alerting. With spawn the
+    workers run as child processes, restarted if they die and stopped with
+    the coordinator; otherwise start them yourself with `worker <shard>`.
+    """
+    stop = stop_on_signals()
+    
+    share_sec_budget()
+    # Workers may be mid-delivery; their 'notifying' filings aren't ours to touch
+    store = load_state(sharded=True)
+    resharded = store.reshard(shards)
+    if resharded:
+        print(f"🔀 Assigned {resharded} queued filing(s) to {shards} shard(s)")
+    metrics_server = start_metrics_server(METRICS_PORT) if METRICS_PORT else None
+    workers = {shard: spawn_worker(shard) for shard in range(shards)} if spawn else {}
+    idle_cycles = 0
+    print(f"🧭 Coordinator mode - polling for {shards} worker(s) (Ctrl+C to stop)\n")
+    rules = load_alert_rules()
+    print_filters(rules)
+    
+    while not stop.is_set():
+        print(f"⏱ Poll at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        try:
+            rules = reload_alert_rules(rules)
+        except ValueError as e:
+            print(f"✗ {e} - keeping the previous rules")
+        
+        try:
+            new_filings, new_count = poll_filings(store, rules, shards)
+            if new_count:
+                print(f"🆕 Queued {new_count} new filing(s) for the workers, {store.backlog_size()} in backlog")
+        except Exception as e:
+            print(f"✗ Poll failed: {e}")
+            import traceback
+            traceback.print_exc()
+            new_filings, new_count = None, 0
+        
+        if new_filings is not None:
+            save_state(store)
+        METRICS.record_rules(rules)
+        
+        for shard, process in workers.items():
+            if process.poll() is not None:
+                print(f"⚠ Worker {shard} exited with {process.returncode}, restarting it")
+                workers[shard] = spawn_worker(shard)
+        
+        idle_cycles = 0 if new_count else idle_cycles + 1
+        interval = idle_interval(idle_cycles)
+        print(f"💤 Next poll in {interval:.0f}s\n")
+        stop.wait(interval)
+    
+    for process in workers.values():
+        process.terminate()
+    for shard, process in workers.items():
+        try:
+            process.wait(SHARD_STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            print(f"⚠ Worker {shard} did not stop in {SHARD_STOP_TIMEOUT}s, killing it")
+            process.kill()
+    save_state(store)
+    store.close()
+    if metrics_server:
+        metrics_server.shutdown()
+    print_transport_stats()
+    print(f"✓ State flushed, coordinator stopped\n{'='*70}\n")
+
+def run_worker(shard):
+    """Lease this shard's due filings in batches, then fetch, parse and alert on them
+    
+    Leases are renewed between batches. If the worker dies, its unfinished
+    filings go to the next worker for the shard once their leases expire;
+    alerts that were mid-delivery are dead-lettered instead of being resent.
+    """
+    stop = stop_on_signals(f"Worker {shard} received")
     
-    # If filters exist, only notify if ticker matches
-    ticker = details.get('ticker', 'N/A').upper() if details else 'N/A'
-    return ticker in ticker_filters
+    share_sec_budget()
+    owner = f"worker-{shard}-{os.getpid()}-{random.getrandbits(32):08x}"
+    store = load_state(shard)
+    # A crashed predecessor's leases would otherwise hold its filings for SHARD_LEASE_SECONDS
+    for previous in store.lease_owners(shard):
+        if not worker_alive(previous):
+            print(f"↩ Took over {store.expire_leases(previous)} filing(s) leased by stopped {previous}")
+    history = HistoryStore()
+    delivery = load_alert_router()
+    exporter = TransactionExporter() if EXPORT_FORMAT else None
+    metrics_server = start_metrics_server(METRICS_PORT + 1 + shard) if METRICS_PORT else None
+    print(f"🔧 Worker {shard} ({owner}) leasing filings from {STATE_DB}\n")
+    rules = load_alert_rules()
+    
+    while not stop.is_set():
+        try:
+            rules = reload_alert_rules(rules)
+        except ValueError as e:
+            print(f"✗ {e} - keeping the previous rules")
+        
+        abandoned = store.abandon_interrupted()
+        if abandoned:
+            print(f"☠ {abandoned} alert(s) were mid-delivery when their worker stopped; see dead-letters")
+        retry_cluster_alerts(delivery)
+        store.renew_leases(owner)
+        batch = store.lease(shard, owner, BACKLOG_BATCH_SIZE)
+        
+        if batch:
+            print(f"📦 Worker {shard} leased {len(batch)} filing(s)\n")
+            try:
+                with METRICS.timed('cycle'):
+                    process_batch(store, rules, delivery, batch, exporter, owner, history)
+            except Exception as e:
+                print(f"✗ Batch failed: {e}")
+                import traceback
+                traceback.print_exc()
+            save_state(store, shard)
+        METRICS.record_cycle(store, delivery, exporter)
+        METRICS.record_rules(rules)
+        if exporter and exporter.due():
+            exporter.flush()
+        
+        if not batch:
+            stop.wait(SHARD_IDLE_WAIT)
+            apply_deliveries(store, delivery)
+    
+    delivery.close()
+    apply_deliveries(store, delivery)
+    store.release_leases(owner)
+    if exporter:
+        exporter.close()
+    save_state(store, shard)
+    store.close()
+    history.close()
+    if metrics_server:
+        metrics_server.shutdown()
+    print_transport_stats()
+    print_export_stats(exporter)
+    print(f"✓ Worker {shard} stopped\n{'='*70}\n")
 
 def main():
     print(f"\n{'='*70}")
@@ -481,78 +3855,100 @@ def main():
             print("✓ Cleared all filters")
             send_filters_notification()
             return
+        elif command == 'refresh-tickers':
+            refresh_company_tickers()
+            return
+        elif command == 'backfill' and len(sys.argv) > 2:
+            args = sys.argv[2:]
+            xml_dir = None
+            if '--xml-dir' in args:
+                index = args.index('--xml-dir')
+                xml_dir = args[index + 1]
+                del args[index:index + 2]
+            watch_all = '--all' in args
+            run_backfill([arg for arg in args if arg != '--all'], xml_dir=xml_dir, watch_all=watch_all)
+            return
+        elif command == 'dead-letters':
+            store = FilingStore()
+            dead = store.dead_letters()
+            for filing in dead:
+                print(f"☠ {filing['accession']} after {filing['attempts']} attempt(s): {filing['last_error']}")
+                print(f"   {filing['title']}\n   {filing['filing_url']}")
+            print(f"{len(dead)} filing(s) in the dead-letter list")
+            store.close()
+            return
+        elif command == 'retry-dead':
+            store = FilingStore()
+            print(f"↻ Re-queued {store.requeue_dead()} dead-lettered filing(s)")
+            store.close()
+            return
+        elif command == 'daemon':
+            run_daemon()
+            return
+        elif command == 'query':
+            args = sys.argv[2:]
+            as_json = '--json' in args
+            args = [arg for arg in args if arg != '--json']
+            if len(args) % 2 or not all(arg.startswith('--') for arg in args[::2]):
+                print("Usage: query [--ticker T] [--cik N] [--owner NAME] [--owner-cik N] [--code S,P] "
+                      "[--role officer,director] [--min-value USD] [--since DATE] [--until DATE] [--days N] "
+                      "[--limit N] [--cursor C] [--json]")
+                return
+            options = {flag[2:].replace('-', '_'): value for flag, value in zip(args[::2], args[1::2])}
+            history = HistoryStore()
+            try:
+                filters, limit, cursor = query_filters(options)
+                results = query_page(history, filters, limit, cursor)
+                if as_json:
+                    for result in results:
+                        print(json.dumps(result))
+                else:
+                    print_query_results(results)
+                results.close()
+            except ValueError as e:
+                print(f"✗ {e}")
+            history.close()
+            return
+        elif command == 'serve-queries':
+            run_query_server(int(sys.argv[2]) if len(sys.argv) > 2 else QUERY_PORT,
+                             sys.argv[3] if len(sys.argv) > 3 else QUERY_HOST)
+            return
+        elif command == 'coordinator' and len(sys.argv) > 2:
+            run_coordinator(int(sys.argv[2]), spawn='--no-spawn' not in sys.argv[3:])
+            return
+        elif command == 'worker' and len(sys.argv) > 2:
+            run_worker(int(sys.argv[2]))
+            return
     
-    # Normal operation - check for filings
-    filters = load_ticker_filters()
-    if filters:
-        print(f"📋 Active ticker filters: {', '.join(sorted(filters))}")
-        print(f"   (Filtering after XML parsing - ticker not always in title)\n")
-    else:
-        print("📋 No filters active - monitoring all tickers\n")
-    
-    # Load last seen filings
-    last_filings = load_last_filings()
-    last_urls = set(f.get('filing_url') for f in last_filings if f.get('filing_url'))
-    
-    # Fetch ALL current filings from SEC RSS feed
-    # We can't filter upfront because ticker isn't always in the title
-    current_filings = fetch_latest_form4_filings()
-    
-    if not current_filings:
-        print("No filings fetched. Exiting.\n")
-        return
+    # Normal operation - check for filings once
+    rules = load_alert_rules()
+    print_filters(rules)
     
-    # Find new filings
-    new_filings = [f for f in current_filings if f.get('filing_url') not in last_urls]
+    store = load_state()
+    history = HistoryStore()
+    delivery = load_alert_router()
+    exporter = TransactionExporter() if EXPORT_FORMAT else None
+    with METRICS.timed('cycle'):
+        changed, _ = run_cycle(store, rules, delivery, exporter, history)
     
-    if new_filings:
-        print(f"\n🆕 Found {len(new_filings)} new filing(s)")
-        if filters:
-            print(f"   Will check each filing's XML to match filters\n")
-        else:
-            print()
-        
-        notified_count = 0
-        skipped_count = 0
-        
-        for filing in reversed(new_filings[:20]):  # Process up to 20 new filings, oldest first
-            title = filing.get('title', 'Unknown')
-            title_short = title[:65] + '...' if len(title) > 65 else title
-            print(f"📄 {title_short}")
-            
-            # Get XML URL
-            xml_url = get_filing_xml_url(filing['filing_url'])
-            
-            if xml_url:
-                # Parse the XML to get the ticker
-                details = parse_form4_xml(xml_url)
-                
-                # Now we can filter based on actual ticker from XML
-                if should_notify_filing(details, filters):
-                    send_discord_notification(filing, details)
-                    notified_count += 1
-                else:
-                    ticker = details.get('ticker', 'N/A') if details else 'N/A'
-                    print(f"  ⊝ Skipped (ticker {ticker} not in filter list)")
-                    skipped_count += 1
-            else:
-                print(f"  ✗ Could not find XML document")
-                if not filters:  # Only notify for parsing failures if no filters
-                    send_discord_notification(filing, None)
-                    notified_count += 1
-            
-            print()
-            time.sleep(0.5)  # Brief pause between notifications
-        
-        if filters:
-            print(f"✓ Sent {notified_count} notification(s), skipped {skipped_count} (not in filter)")
-        else:
-            print(f"✓ Sent {notified_count} notification(s)")
-    else:
-        print("No new filings to process")
+    # Wait for the sender thread to get everything out
+    delivery.close()
+    apply_deliveries(store, delivery)
+    if exporter:
+        exporter.close()
+    METRICS.record_cycle(store, delivery, exporter)
+    METRICS.record_rules(rules)
+    delivery.print_stats()
+    print_transport_stats()
+    print_export_stats(exporter)
+    print_rule_stats(rules)
+    write_metrics_summary()
+    dump_parse_profile()
     
     # Save state
-    save_last_filings(current_filings)
+    if changed:
+        save_state(store)
+    store.close()
     print(f"✓ State saved\n{'='*70}\n")
 
 if __name__ == "__main__":
@@ -0,0 +1,186 @@
+"""ClusterDetector: the rolling window, once-per-window alerts and retried cluster deliveries"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sec_form4_bot as bot
+
+
+class RecordingDelivery:
+    """Stands in for an AlertRouter: records submissions and reports scripted outcomes"""
+
+    def __init__(self):
+        self.submitted = []
+        self.outcomes = []
+
+    def submit(self, embed, key=None, **kwargs):
+        self.submitted.append(dict(kwargs, key=key))
+
+    def completed(self):
+        done, self.outcomes = self.outcomes, []
+        return done
+
+
+@pytest.fixture
+def detector(monkeypatch):
+    detector = bot.ClusterDetector()
+    monkeypatch.setattr(bot, 'CLUSTER_DETECTOR', detector)
+    return detector
+
+
+def cluster(ticker='NVDA'):
+    return {'ticker': ticker, 'issuer_name': 'NVIDIA CORP', 'buyers': ['A', 'B', 'C'], 'buy_value': 900000.0,
+            'sell_value': 0.0, 'net_flow': 900000.0, 'ratio': float('inf'), 'window_end': '2025-06-02'}
+
+
+def test_failed_cluster_alert_is_retried_to_the_failed_destination(detector, capsys):
+    delivery = RecordingDelivery()
+    bot.send_cluster_alert(delivery, cluster())
+    key = delivery.submitted[0]['key']
+    assert key == 'cluster:NVDA:2025-06-02'
+
+    delivery.outcomes = [(key, ['discord'])]
+    bot.apply_deliveries(None, delivery)
+    assert 'will be retried' in capsys.readouterr().out
+    assert list(detector.retries) == [key]
+
+    # Survives a restart, Infinity ratio and all
+    restored = bot.ClusterDetector()
+    restored.load(json.loads(json.dumps(detector.to_dict())))
+    assert restored.retries[key]['cluster']['ratio'] == float('inf')
+
+    assert bot.retry_cluster_alerts(delivery) == 0  # Still backing off
+    detector.retries[key]['next_attempt'] = 0
+    assert bot.retry_cluster_alerts(delivery) == 1
+    assert delivery.submitted[1]['key'] == key
+    assert delivery.submitted[1]['only'] == ['discord']
+
+    delivery.outcomes = [(key, [])]
+    bot.apply_deliveries(None, delivery)
+    assert not detector.retries and not detector.sending
+
+
+def test_cluster_alert_is_dropped_after_the_last_attempt(detector, monkeypatch, capsys):
+    monkeypatch.setattr(bot, 'RETRY_MAX_ATTEMPTS', 2)
+    delivery = RecordingDelivery()
+    bot.send_cluster_alert(delivery, cluster())
+    key = delivery.submitted[0]['key']
+
+    delivery.outcomes = [(key, ['discord'])]
+    bot.apply_deliveries(None, delivery)
+    detector.retries[key]['next_attempt'] = 0
+    bot.retry_cluster_alerts(delivery)
+    delivery.outcomes = [(key, ['discord'])]
+    bot.apply_deliveries(None, delivery)
+
+    out = capsys.readouterr().out
+    assert 'cluster alert dropped' in out
+    assert not detector.retries and not detector.sending
+
+
+def test_untracked_failures_are_not_promised_a_retry(capsys):
+    delivery = RecordingDelivery()
+    delivery.outcomes = [(None, ['discord'])]
+    bot.apply_deliveries(None, delivery)
+    out = capsys.readouterr().out
+    assert 'will be retried' not in out
+    assert 'could not be delivered to discord' in out
+
+
+def filing(accession, day, ticker='NVDA', owner='A', code='P', amount=100000.0, derivative=False):
+    """A feed entry and its parsed details, with one transaction"""
+    details = bot.Form4Filing(issuer_name='NVIDIA CORP', ticker=ticker, cik='1045810',
+                              owner=bot.ReportingOwner(name=f"Insider {owner}", cik=owner),
+                              transactions=[bot.Transaction(code=code, amount=amount, is_derivative=derivative)])
+    return {'accession': accession, 'filing_date': f"{day}T16:00:00-04:00"}, details
+
+
+def add(detector, *args, **kwargs):
+    return detector.add(*filing(*args, **kwargs))
+
+
+def recomputed(detector, ticker):
+    """A ticker's aggregates rebuilt from scratch out of the events in the window"""
+    events = [e for e in detector.events if e[1] == ticker]
+    return (sum(e[4] for e in events), sum(e[5] for e in events), {e[2] for e in events if e[4]})
+
+
+def test_three_buyers_with_enough_net_flow_alert():
+    detector = bot.ClusterDetector()
+    assert add(detector, 'a1', '2025-06-02', owner='A') == []
+    assert add(detector, 'a2', '2025-06-03', owner='B') == []
+    alerts = add(detector, 'a3', '2025-06-04', owner='C')
+    assert [a['ticker'] for a in alerts] == ['NVDA']
+    assert alerts[0]['buyers'] == ['Insider A', 'Insider B', 'Insider C']
+    assert alerts[0]['net_flow'] == 300000.0
+    assert alerts[0]['window_end'] == '2025-06-04'
+
+
+def test_one_insider_buying_repeatedly_is_not_a_cluster():
+    detector = bot.ClusterDetector()
+    for i in range(5):
+        assert add(detector, f"a{i}", '2025-06-02', owner='A') == []
+
+
+def test_sales_and_non_open_market_codes_hold_a_cluster_back():
+    detector = bot.ClusterDetector()
+    add(detector, 'a1', '2025-06-02', owner='A')
+    add(detector, 'a2', '2025-06-02', owner='B')
+    add(detector, 's1', '2025-06-02', owner='D', code='S', amount=200000.0)
+    assert add(detector, 'g1', '2025-06-02', owner='E', code='A', amount=10 ** 7) == []
+    assert add(detector, 'o1', '2025-06-02', owner='F', derivative=True, amount=10 ** 7) == []
+    # Three buyers, but $300k bought against $200k sold is under the 2x ratio
+    assert add(detector, 'a3', '2025-06-02', owner='C') == []
+    assert add(detector, 'a4', '2025-06-02', owner='G', amount=500000.0) != []
+
+
+def test_alerts_once_per_window_then_again_after_it_passes():
+    detector = bot.ClusterDetector()
+    for i, owner in enumerate('ABC'):
+        add(detector, f"a{i}", '2025-06-02', owner=owner)
+    assert add(detector, 'a3', '2025-06-03', owner='D') == []
+    assert add(detector, 'a4', '2025-06-05', owner='E') == []
+
+    # A week on, the first buys have expired and a new cluster forms
+    for i, owner in enumerate('FGH'):
+        alerts = add(detector, f"b{i}", '2025-06-13', owner=owner)
+    assert [a['buyers'] for a in alerts] == [['Insider F', 'Insider G', 'Insider H']]
+
+
+def test_expired_events_leave_the_running_aggregates():
+    detector = bot.ClusterDetector()
+    add(detector, 'a1', '2025-06-01', owner='A', amount=100.0)
+    add(detector, 's1', '2025-06-03', owner='B', code='S', amount=40.0)
+    add(detector, 'a2', '2025-06-05', owner='C', amount=7.0)
+    add(detector, 'a3', '2025-06-09', owner='D', amount=1.0)  # Pushes 06-01 out of the 7-day window
+
+    agg = detector.tickers['NVDA']
+    assert (agg['buy_value'], agg['sell_value'], set(agg['buyers'])) == recomputed(detector, 'NVDA')
+    assert set(agg['buyers']) == {'C', 'D'}
+    assert 'a1' not in detector.accessions
+
+    add(detector, 'z1', '2025-06-30', ticker='AMD', owner='X')
+    assert 'NVDA' not in detector.tickers  # Tickers that go quiet cost nothing
+
+
+def test_a_reparsed_filing_is_not_counted_twice():
+    detector = bot.ClusterDetector()
+    add(detector, 'a1', '2025-06-02', owner='A')
+    add(detector, 'a1', '2025-06-02', owner='A')
+    assert detector.tickers['NVDA']['buy_value'] == 100000.0
+
+
+def test_window_round_trips_through_the_store():
+    detector = bot.ClusterDetector()
+    for i, owner in enumerate('ABC'):
+        add(detector, f"a{i}", '2025-06-02', owner=owner)
+
+    restored = bot.ClusterDetector()
+    restored.load(json.loads(json.dumps(detector.to_dict())))
+    assert restored.tickers['NVDA']['buy_value'] == detector.tickers['NVDA']['buy_value']
+    assert add(restored, 'a3', '2025-06-03', owner='D') == []  # Still alerted for this window
+    assert add(restored, 'a0', '2025-06-02', owner='A') == []
+    assert restored.tickers['NVDA']['buy_value'] == 400000.0
@@ -0,0 +1,92 @@
+"""Webhook senders: rate-limit parsing and a sender that always settles its batches"""
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sec_form4_bot as bot
+
+
+class RateLimitedHandler(BaseHTTPRequestHandler):
+    """Answers every post with a 429, a plain-text body and an HTTP-date Retry-After"""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = b'slow down'
+        self.send_response(429)
+        self.send_header('Retry-After', 'Wed, 21 Oct 2015 07:28:00 GMT')
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def webhook():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RateLimitedHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/hook"
+    server.shutdown()
+
+
+def finishes(call, timeout=10):
+    """Whether call() returns within timeout; a dead sender thread makes flush() block forever"""
+    thread = threading.Thread(target=call, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    return not thread.is_alive()
+
+
+@pytest.fixture(autouse=True)
+def fast_delivery(monkeypatch):
+    monkeypatch.setattr(bot, 'DISCORD_BATCH_LINGER', 0)
+    monkeypatch.setattr(bot, 'DISCORD_RETRY_BASE', 0.01)
+
+
+class FakeResponse:
+    def __init__(self, body=None, headers=None):
+        self.body = body
+        self.headers = headers or {}
+
+    def json(self):
+        if self.body is None:
+            raise ValueError('not JSON')
+        return self.body
+
+
+@pytest.mark.parametrize('response, expected', [
+    (FakeResponse({'retry_after': 2.5}), 2.5),
+    (FakeResponse(None, {'Retry-After': '7'}), 7.0),
+    (FakeResponse(['not', 'a', 'dict'], {'Retry-After': '3'}), 3.0),
+    (FakeResponse(None, {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'}), 0.0),
+    (FakeResponse(None, {'Retry-After': 'soon'}), 0.01),
+    (FakeResponse(None), 0.01),
+])
+def test_retry_after_seconds(response, expected):
+    assert bot.retry_after_seconds(response) == expected
+
+
+def test_http_date_retry_after_gives_up_instead_of_hanging(webhook):
+    sender = bot.JsonWebhookDelivery(webhook, name='sink')
+    sender.submit({'alert': 1}, key='a1')
+    assert finishes(sender.close)
+    assert sender.completed() == [('a1', False)]
+
+
+def test_sender_survives_an_exception_in_post(monkeypatch):
+    def broken_post(self, payload, count):
+        raise RuntimeError('boom')
+
+    monkeypatch.setattr(bot.DiscordDelivery, '_post', broken_post)
+    sender = bot.DiscordDelivery('http://127.0.0.1:9/unused')
+    sender.submit({'title': 'first'}, key='a1')
+    assert finishes(sender.flush)
+    sender.submit({'title': 'second'}, key='a2')
+    assert finishes(sender.close)
+    assert sender.completed() == [('a1', False), ('a2', False)]
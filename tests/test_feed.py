@@ -0,0 +1,91 @@
+"""Feed polling: paging back to the watermark and merging issuer and owner entries"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sec_form4_bot as bot
+
+
+def entry(n, issuer_cik=None, minute=None):
+    """Feed entry n; higher numbers are newer"""
+    minute = n if minute is None else minute
+    return {'accession': f"0000000000-25-{n:06d}", 'filing_url': f"https://example.test/{n}",
+            'filing_date': f"2025-06-02T10:{minute:02d}:00-04:00", 'issuer_cik': issuer_cik,
+            'title': f"4 - filing {n}"}
+
+
+@pytest.fixture
+def feed(monkeypatch):
+    """A feed of pages served newest first, recording which offsets were fetched"""
+    monkeypatch.setattr(bot, 'FEED_PAGE_SIZE', 2)
+    monkeypatch.setattr(bot, 'MAX_FEED_PAGES', 3)
+
+    class Feed:
+        entries = []
+        fetched = []
+
+    def fetch_feed_page(start, conditional=False):
+        Feed.fetched.append(start)
+        return Feed.entries[start:start + bot.FEED_PAGE_SIZE]
+
+    monkeypatch.setattr(bot, 'fetch_feed_page', fetch_feed_page)
+    return Feed
+
+
+def accessions(filings):
+    return [f['accession'][-2:] for f in filings]
+
+
+def test_first_run_fetches_a_single_page(feed):
+    feed.entries = [entry(n) for n in range(9, 0, -1)]
+    assert accessions(bot.fetch_new_form4_filings(None, set())) == ['08', '09']
+    assert feed.fetched == [0]
+
+
+def test_pages_back_until_the_watermark(feed):
+    feed.entries = [entry(n) for n in range(9, 0, -1)]
+    watermark = {'updated': entry(5)['filing_date']}
+    # Entries filed at the watermark minute are kept; the seen-set drops the ones already handled
+    assert accessions(bot.fetch_new_form4_filings(watermark, {entry(5)['accession']})) == ['06', '07', '08', '09']
+    assert feed.fetched == [0, 2, 4]
+
+
+def test_seen_accession_stops_paging_without_a_usable_time(feed):
+    feed.entries = [entry(n) for n in range(9, 0, -1)]
+    feed.entries[2] = dict(feed.entries[2], filing_date='garbled')
+    watermark = {'updated': '2025-06-01T00:00:00-04:00'}
+    # The rest of the page is still read, in case entries are out of order
+    assert accessions(bot.fetch_new_form4_filings(watermark, {entry(7)['accession']})) == ['06', '08', '09']
+    assert feed.fetched == [0, 2]
+
+
+def test_gives_up_after_max_pages(feed, capsys):
+    feed.entries = [entry(n) for n in range(30, 0, -1)]
+    watermark = {'updated': '2025-06-01T00:00:00-04:00'}
+    assert len(bot.fetch_new_form4_filings(watermark, set())) == 6
+    assert feed.fetched == [0, 2, 4]
+    assert 'without reaching the watermark' in capsys.readouterr().out
+
+
+def test_issuer_entry_wins_the_merge_whichever_page_it_is_on(feed):
+    owner, issuer = entry(1), entry(1, issuer_cik=1045810)
+    issuer['title'] = '4 - NVIDIA CORP (Issuer)'
+    # Owner entry first on page one, issuer entry on page two
+    feed.entries = [entry(3), owner, issuer, entry(0)]
+    watermark = {'updated': '2025-06-01T00:00:00-04:00'}
+    filings = bot.fetch_new_form4_filings(watermark, set())
+    assert accessions(filings) == ['00', '01', '03']
+    assert filings[1]['issuer_cik'] == 1045810
+    assert filings[1]['title'] == '4 - NVIDIA CORP (Issuer)'
+
+    # And an owner entry listed after the issuer entry doesn't overwrite it
+    feed.entries = [entry(3), issuer, owner, entry(0)]
+    filings = bot.fetch_new_form4_filings(watermark, set())
+    assert filings[1]['issuer_cik'] == 1045810
+
+
+def test_unchanged_feed_returns_none(monkeypatch):
+    monkeypatch.setattr(bot, 'fetch_feed_page', lambda start, conditional=False: None)
+    assert bot.fetch_new_form4_filings({'updated': '2025-06-01T00:00:00Z'}, set()) is None
@@ -0,0 +1,55 @@
+"""Transient failures keep what was already learned, so a retry doesn't repeat the lookup"""
+import os
+import sys
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sec_form4_bot as bot
+
+ACCESSION = '0001045810-25-000001'
+FILING_URL = f"{bot.SEC_ARCHIVES_BASE}/1045810/000104581025000001/{ACCESSION}-index.htm"
+XML_URL = f"{bot.SEC_ARCHIVES_BASE}/1045810/000104581025000001/form4.xml"
+
+
+class NoDelivery:
+    def submit(self, *args, **kwargs):
+        raise AssertionError('nothing should be alerted')
+
+    def completed(self):
+        return []
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(bot, 'XML_URL_CACHE', {})
+    monkeypatch.setattr(bot, 'FILING_CACHE', bot.FilingCache(str(tmp_path / 'cache')))
+    store = bot.FilingStore()
+    store.enqueue([{'accession': ACCESSION, 'filing_url': FILING_URL, 'title': '4 - NVIDIA CORP'}])
+    yield store
+    store.close()
+
+
+def test_resolved_xml_url_survives_a_failed_download(store, monkeypatch):
+    def download_times_out(xml_url, accession=None):
+        raise requests.Timeout('read timed out')
+
+    monkeypatch.setattr(bot, 'get_filing_xml_url', lambda filing_url: XML_URL)
+    monkeypatch.setattr(bot, 'parse_form4_xml', download_times_out)
+    bot.process_batch(store, bot.AlertRules([]), NoDelivery(), store.backlog(10))
+
+    row = store.db.execute('SELECT status, xml_url FROM filings WHERE accession = ?', (ACCESSION,)).fetchone()
+    assert (row['status'], row['xml_url']) == ('retry', XML_URL)
+
+    # The next run starts with an empty in-process cache and must not resolve again
+    def no_lookup(filing_url):
+        raise AssertionError('index.json looked up again')
+
+    monkeypatch.setattr(bot, 'get_filing_xml_url', no_lookup)
+    monkeypatch.setattr(bot, 'parse_form4_xml', lambda xml_url, accession=None: None)
+    with store.db:
+        store.db.execute('UPDATE filings SET next_attempt = 0')
+    xml_url, details, error = bot.fetch_filing_details(store.backlog(10)[0])
+    assert (xml_url, error) == (XML_URL, None)
@@ -0,0 +1,106 @@
+"""Alert rules: the feed-entry stage, the document stage and reloading"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sec_form4_bot as bot
+
+TICKERS = {'NVDA': 1045810, 'AMD': 2488}
+
+
+@pytest.fixture(autouse=True)
+def company_tickers(monkeypatch):
+    monkeypatch.setattr(bot, 'load_company_tickers', lambda: dict(TICKERS))
+
+
+def entry(issuer_cik):
+    return {'accession': f"entry-{issuer_cik}", 'issuer_cik': issuer_cik}
+
+
+def document(*transactions, ticker='NVDA', cik='1045810', director=False, officer=False):
+    return bot.Form4Filing(ticker=ticker, cik=cik,
+                           owner=bot.ReportingOwner(is_director=director, is_officer=officer),
+                           transactions=[bot.Transaction(code=code, amount=amount, is_derivative=derivative)
+                                         for code, amount, derivative in transactions])
+
+
+def test_entry_stage_rejects_other_issuers_before_fetching():
+    rules = bot.AlertRules([{'name': 'semis', 'tickers': ['NVDA', 'amd']}])
+    assert rules.issuer_ciks() == {1045810, 2488}
+
+    candidates, rejected = rules.prefilter([entry(1045810), entry(320193), entry(None)])
+    # An entry without an issuer CIK can't be ruled out until its XML is parsed
+    assert [f['issuer_cik'] for f in candidates] == [1045810, None]
+    assert [f['issuer_cik'] for f in rejected] == [320193]
+    assert rules.rules[0].entry_rejected == 1
+
+
+def test_unmapped_ticker_defers_to_the_document_stage(capsys):
+    rules = bot.AlertRules([{'name': 'odd', 'tickers': ['NOPE']}])
+    assert 'no CIK known for NOPE' in capsys.readouterr().out
+    assert rules.issuer_ciks() is None
+    assert rules.prefilter([entry(320193)]) == ([entry(320193)], [])
+    assert rules.match(entry(320193), document(('P', 1, False), ticker='AAPL', cik='320193')) == []
+    assert rules.match(entry(None), document(('P', 1, False), ticker='NOPE', cik='1')) == ['odd']
+
+
+def test_min_value_only_counts_transactions_passing_codes_and_derivative():
+    rules = bot.AlertRules([{'name': 'big-buys', 'codes': ['P'], 'derivative': False, 'min_value': 100000}])
+    filing = entry(1045810)
+    assert rules.match(filing, document(('P', 60000, False), ('S', 10 ** 6, False))) == []
+    assert rules.match(filing, document(('P', 60000, False), ('P', 90000, True))) == []
+    assert rules.match(filing, document(('P', 60000, False), ('P', 50000, False))) == ['big-buys']
+    assert rules.match(filing, document(('S', 10 ** 6, False))) == []
+
+
+def test_document_checks_and_counters():
+    rules = bot.AlertRules([{'name': 'nvda-officers', 'tickers': ['NVDA'], 'roles': ['officer']},
+                            {'name': 'directors', 'roles': ['director']}])
+    filing = entry(1045810)
+    assert rules.match(filing, document(officer=True)) == ['nvda-officers']
+    assert rules.match(filing, document(director=True)) == ['directors']
+    assert rules.match(entry(2488), document(officer=True, ticker='AMD', cik='2488')) == []
+
+    # The AMD filing never reaches the officers rule's document checks
+    officers, directors = rules.rules
+    assert (officers.hits, officers.document_rejected) == (1, 1)
+    assert (directors.hits, directors.document_rejected) == (1, 2)
+
+
+def test_empty_rules_match_everything():
+    rules = bot.AlertRules([])
+    assert not rules and rules.unrestricted()
+    assert rules.match(entry(None), None) == ['all']
+
+
+@pytest.mark.parametrize('spec, message', [
+    ({'tickerz': ['NVDA']}, 'unknown key'),
+    ({'roles': ['janitor']}, 'unknown role'),
+])
+def test_bad_rules_are_rejected(spec, message):
+    with pytest.raises(ValueError, match=message):
+        bot.AlertRules([spec])
+
+
+def test_reload_keeps_rules_and_counters_until_the_file_changes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / bot.ALERT_RULES_FILE
+    path.write_text(json.dumps({'rules': [{'name': 'buys', 'codes': ['P']}]}))
+    rules = bot.load_alert_rules()
+    rules.match(entry(1), document(('P', 1, False)))
+    assert bot.reload_alert_rules(rules) is rules
+
+    path.write_text(json.dumps({'rules': [{'name': 'buys', 'codes': ['P', 'S']}]}))
+    os.utime(path, (1, 1))
+    reloaded = bot.reload_alert_rules(rules)
+    assert reloaded is not rules
+    assert reloaded.rules[0].hits == 1
+
+    path.write_text('{broken')
+    os.utime(path, (2, 2))
+    with pytest.raises(ValueError):
+        bot.reload_alert_rules(reloaded)
+    assert bot.reload_alert_rules(reloaded) is reloaded  # Reported once, previous rules kept
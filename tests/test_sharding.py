@@ -0,0 +1,98 @@
+"""Lease -> claim -> crash -> restart: an interrupted alert is never sent twice"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sec_form4_bot as bot
+
+SHARDS = 2
+CIK = 1045810
+ACCESSION = '0001045810-25-000001'
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """A scratch state directory, with the process-wide state run_coordinator touches put back afterwards"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(bot, 'METRICS_PORT', 0)
+    monkeypatch.setattr(bot, 'SEC_RATE_LIMITER', bot.SEC_RATE_LIMITER)
+    monkeypatch.setattr(bot.signal, 'signal', lambda signum, handler: None)
+    return tmp_path
+
+
+def dead_owner(shard):
+    """A lease owner name whose process has already exited"""
+    process = subprocess.Popen([sys.executable, '-c', ''])
+    process.wait()
+    return f"worker-{shard}-{process.pid}-deadbeef"
+
+
+def live_owner(shard):
+    return f"worker-{shard}-{os.getpid()}-0badcafe"
+
+
+def claimed_filing(owner):
+    """Queue one filing, lease it to owner and claim its alert, as process_batch does"""
+    store = bot.FilingStore()
+    store.enqueue([{'accession': ACCESSION, 'issuer_cik': CIK,
+                    'filing_url': f"{bot.SEC_ARCHIVES_BASE}/{CIK}/000104581025000001/{ACCESSION}-index.htm"}],
+                  shards=SHARDS)
+    shard = CIK % SHARDS
+    assert [f['accession'] for f in store.lease(shard, owner, 10)] == [ACCESSION]
+    store.set_status(ACCESSION, 'parsed')
+    assert store.claim_alert(ACCESSION, owner)
+    return store, shard
+
+
+def restart_coordinator():
+    """Run the coordinator's startup, stopping it at its first poll"""
+    def first_poll(store, rules, shards=None):
+        raise KeyboardInterrupt
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(bot, 'poll_filings', first_poll)
+        with pytest.raises(KeyboardInterrupt):
+            bot.run_coordinator(SHARDS, spawn=False)
+
+
+def restart_worker(shard):
+    """A new worker's startup and first lease, as in run_worker"""
+    store = bot.load_state(shard)
+    for previous in store.lease_owners(shard):
+        if not bot.worker_alive(previous):
+            store.expire_leases(previous)
+    abandoned = store.abandon_interrupted()
+    return store, abandoned, store.lease(shard, live_owner(shard), 10)
+
+
+def row(store):
+    return store.db.execute('SELECT * FROM filings WHERE accession = ?', (ACCESSION,)).fetchone()
+
+
+def test_crashed_worker_alert_is_dead_lettered_not_resent(workdir):
+    store, shard = claimed_filing(dead_owner(CIK % SHARDS))
+
+    restart_coordinator()
+    assert row(store)['status'] == 'notifying'
+
+    new_store, abandoned, batch = restart_worker(shard)
+    assert abandoned == 1
+    assert batch == []
+    assert row(store)['status'] == 'dead'
+    assert not new_store.claim_alert(ACCESSION, live_owner(shard))
+    assert [f['accession'] for f in store.dead_letters()] == [ACCESSION]
+
+
+def test_live_worker_keeps_its_alert_across_a_coordinator_restart(workdir):
+    owner = live_owner(CIK % SHARDS)
+    store, shard = claimed_filing(owner)
+
+    restart_coordinator()
+    assert row(store)['status'] == 'notifying'
+    assert row(store)['lease_owner'] == owner
+
+    assert store.abandon_interrupted() == 0
+    assert store.lease(shard, f"worker-{shard}-{os.getpid()}-00000002", 10) == []